@@ -0,0 +1,343 @@
+"""
+Benchmark grid resolution, poll latency and every reduction type.
+
+Synthetic quad grids, open cylinders and UV spheres are generated at a
+range of face counts. Each of the operations in type_definitions is
+applied to a fresh copy of every mesh, and the wall time, peak memory
+and number of mesh operator calls are recorded per phase.
+
+Run with the headless NumPy core:
+
+    python benchmarks/bench_reductions.py --output results.json
+
+or inside Blender to measure the bmesh add-on as well:
+
+    blender -b --python benchmarks/bench_reductions.py -- --backend bmesh --output results.json
+"""
+
+import argparse
+import ast
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from edge_loop_reducer import edge_loop_core as core
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000, 10000000]
+SHAPES = ["grid", "cylinder", "sphere"]
+
+# Across and down directions used for the anchor of each shape
+SHAPE_DIRECTIONS = {
+        "grid" : (1, -2),
+        "cylinder" : (2, -3),
+        "sphere" : (2, -3)
+        }
+
+def _quad_strip(num_rows, num_columns, wrap):
+    """
+    Return CSR face arrays for a (rows x columns) quad strip whose vertex
+    rows hold columns (+1 unless wrap) vertices each.
+    """
+    row_length = num_columns if wrap else num_columns + 1
+    r, c = np.meshgrid(np.arange(num_rows), np.arange(num_columns), indexing="ij")
+    r, c = r.ravel(), c.ravel()
+    c_next = (c + 1) % row_length
+    loops = np.stack([r*row_length + c, (r + 1)*row_length + c,
+                      (r + 1)*row_length + c_next, r*row_length + c_next], axis=1)
+    num_faces = len(loops)
+    return (np.arange(num_faces, dtype=np.int64)*4, np.full(num_faces, 4, dtype=np.int64),
+            loops.ravel().astype(np.int64))
+
+def make_grid(num_faces):
+    """
+    Return (co, face_start, face_size, loop_vert, anchor) for a flat grid
+    in the XY plane with about num_faces quads.
+    """
+    n = max(8, int(math.ceil(math.sqrt(num_faces))))
+    x, y = np.meshgrid(np.arange(n + 1, dtype=np.float64), -np.arange(n + 1, dtype=np.float64))
+    co = np.stack([x.ravel(), y.ravel(), np.zeros(x.size)], axis=1)
+    face_start, face_size, loop_vert = _quad_strip(n, n, wrap=False)
+    anchor = (n//2 - 2)*(n + 1) + n//2 - 3
+    return co, face_start, face_size, loop_vert, anchor
+
+def make_cylinder(num_faces):
+    """
+    Return mesh arrays and an anchor for an open cylinder around Z with
+    about num_faces quads. The anchor faces +X.
+    """
+    segments = max(32, int(math.ceil(math.sqrt(num_faces))))
+    rings = max(8, int(math.ceil(num_faces/segments)))
+    angle = 2*math.pi*np.arange(segments)/segments
+    z = -np.arange(rings + 1, dtype=np.float64)*(2*math.pi/segments)
+    co = np.stack([np.tile(np.cos(angle), rings + 1), np.tile(np.sin(angle), rings + 1),
+                   np.repeat(z, segments)], axis=1)
+    face_start, face_size, loop_vert = _quad_strip(rings, segments, wrap=True)
+    anchor = (rings//2 - 2)*segments
+    return co, face_start, face_size, loop_vert, anchor
+
+def make_sphere(num_faces):
+    """
+    Return mesh arrays and an anchor for a UV sphere with about num_faces
+    faces (quads, with triangle fans at the poles). The anchor sits on the
+    equator facing +X.
+    """
+    rings = max(16, int(math.ceil(math.sqrt(num_faces/2))))
+    segments = 2*rings
+    lat = math.pi*np.arange(1, rings)/rings
+    lon = 2*math.pi*np.arange(segments)/segments
+    ring_co = np.stack([np.outer(np.sin(lat), np.cos(lon)).ravel(),
+                        np.outer(np.sin(lat), np.sin(lon)).ravel(),
+                        np.repeat(np.cos(lat), segments)], axis=1)
+    top, bottom = len(ring_co), len(ring_co) + 1
+    co = np.concatenate([ring_co, [[0, 0, 1], [0, 0, -1]]])
+    quad_start, quad_size, quad_loops = _quad_strip(rings - 2, segments, wrap=True)
+    s = np.arange(segments)
+    s_next = (s + 1) % segments
+    last = (rings - 2)*segments
+    tris = np.concatenate([np.stack([np.full(segments, top), s, s_next], axis=1),
+                           np.stack([last + s, np.full(segments, bottom), last + s_next], axis=1)])
+    face_size = np.concatenate([quad_size, np.full(len(tris), 3, dtype=np.int64)])
+    loop_vert = np.concatenate([quad_loops, tris.ravel()]).astype(np.int64)
+    face_start = np.zeros(len(face_size), dtype=np.int64)
+    np.cumsum(face_size[:-1], out=face_start[1:])
+    anchor = (rings//2 - 3)*segments
+    return co, face_start, face_size, loop_vert, anchor
+
+GENERATORS = {
+        "grid" : make_grid,
+        "cylinder" : make_cylinder,
+        "sphere" : make_sphere
+        }
+
+class Phase:
+    """
+    Time a block of code and record the peak traced memory inside it.
+    """
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.record["time_" + self.name] = elapsed
+        self.record["peak_bytes_" + self.name] = tracemalloc.get_traced_memory()[1]
+        return False
+
+class CountingOps:
+    """
+    Proxy for bmesh.ops that counts the calls made to each operator.
+    """
+    def __init__(self, ops, counts):
+        self._ops = ops
+        self._counts = counts
+
+    def __getattr__(self, name):
+        op = getattr(self._ops, name)
+        counts = self._counts
+        def call(*args, **kwargs):
+            counts[name] = counts.get(name, 0) + 1
+            return op(*args, **kwargs)
+        return call
+
+class CountingBmesh:
+    """
+    Stand-in for the bmesh module whose ops attribute counts calls.
+    """
+    def __init__(self, module, counts):
+        self._module = module
+        self.ops = CountingOps(module.ops, counts)
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+class CountingPolyMesh(core.PolyMesh):
+    """
+    PolyMesh that counts calls to its editing operators.
+    """
+    __slots__ = ("counts",)
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.counts = {}
+
+def _counted(name):
+    method = getattr(core.PolyMesh, name)
+    def call(self, *args, **kwargs):
+        self.counts[name] = self.counts.get(name, 0) + 1
+        return method(self, *args, **kwargs)
+    return call
+
+for _name in ("add_verts", "add_faces", "remove_faces", "remove_edges", "merge_faces",
+              "dissolve_edges", "dissolve_verts", "connect_verts", "recalc_face_normals"):
+    setattr(CountingPolyMesh, _name, _counted(_name))
+
+def run_core(shape, arrays, type, dissolve):
+    """
+    Apply one reduction with the NumPy core and return its record.
+    """
+    co, face_start, face_size, loop_vert, anchor = arrays
+    directions = SHAPE_DIRECTIONS[shape]
+    grid_info = core.type_definitions[type]
+    record = {}
+    with Phase(record, "build"):
+        mesh = CountingPolyMesh(co, face_start, face_size, loop_vert)
+    with Phase(record, "index"):
+        mesh.vert_faces(anchor)
+    with Phase(record, "grid"):
+        rows = core.resolve_grid(mesh, anchor, grid_info[0], grid_info[1], directions)
+    record["resolved"] = rows is not None
+    if (rows is not None):
+        mesh.counts.clear()
+        with Phase(record, "apply"):
+            core.apply_pattern(mesh, core.patterns[type], rows, dissolve)
+        record["operator_calls"] = dict(mesh.counts)
+    return record
+
+def run_bmesh(shape, arrays, type, dissolve):
+    """
+    Apply one reduction through the bmesh add-on and return its record.
+    Must run inside Blender.
+    """
+    import bpy
+    import bmesh
+    from edge_loop_reducer import edge_loop_reduce as addon
+
+    co, face_start, face_size, loop_vert, anchor = arrays
+    directions = SHAPE_DIRECTIONS[shape]
+    grid_info = core.type_definitions[type]
+    record = {}
+    with Phase(record, "build"):
+        me = bpy.data.meshes.new("bench_" + shape)
+        me.vertices.add(len(co))
+        me.vertices.foreach_set("co", co.astype(np.float32).ravel())
+        me.loops.add(len(loop_vert))
+        me.loops.foreach_set("vertex_index", loop_vert.astype(np.int32))
+        me.polygons.add(len(face_start))
+        me.polygons.foreach_set("loop_start", face_start.astype(np.int32))
+        if (not me.polygons.bl_rna.properties["loop_total"].is_readonly):
+            me.polygons.foreach_set("loop_total", face_size.astype(np.int32))
+        me.update(calc_edges=True)
+        bm = bmesh.new()
+        bm.from_mesh(me)
+        bm.verts.ensure_lookup_table()
+    obj = bpy.data.objects.new("bench_" + shape, me)
+    start_vert = bm.verts[anchor]
+    start_vert.select = True
+    bm.select_history.add(start_vert)
+
+    with Phase(record, "poll_cold"):
+        addon._patch_cache.clear()
+        patch = addon.lookup_patch(obj, bm, type, directions)
+    with Phase(record, "poll_warm"):
+        addon.lookup_patch(obj, bm, type, directions)
+    with Phase(record, "grid"):
+        patch = addon.resolve_grid(bm, grid_info[0], grid_info[1], directions, start_vert)
+    record["resolved"] = patch is not None
+    if (patch is not None):
+        counts = {}
+        real_bmesh = addon.bmesh
+        addon.bmesh = CountingBmesh(real_bmesh, counts)
+        try:
+            with Phase(record, "apply"):
+                addon.apply_pattern(bm, addon.patterns[type], patch, dissolve)
+        finally:
+            addon.bmesh = real_bmesh
+        record["operator_calls"] = counts
+    bm.free()
+    bpy.data.objects.remove(obj)
+    bpy.data.meshes.remove(me)
+    return record
+
+BACKENDS = {
+        "core" : run_core,
+        "bmesh" : run_bmesh
+        }
+
+def addon_version():
+    """
+    Read bl_info["version"] from the add-on without importing bpy.
+    """
+    with open(os.path.join(REPO_DIR, "edge_loop_reducer", "__init__.py")) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and getattr(node.targets[0], "id", None) == "bl_info"):
+            return list(ast.literal_eval(node.value)["version"])
+    return None
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=sorted(BACKENDS), action="append",
+                        help="backend to measure (repeatable, default: core)")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated target face counts")
+    parser.add_argument("--shapes", default=",".join(SHAPES),
+                        help="comma separated shapes (%s)" % ", ".join(SHAPES))
+    parser.add_argument("--types", default=",".join(core.type_definitions),
+                        help="comma separated reduction types")
+    parser.add_argument("--dissolve", action="store_true",
+                        help="apply the reductions with Dissolve Extra Verts")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="runs per case; the fastest is reported")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    backends = args.backend or ["core"]
+    sizes = [int(float(s)) for s in args.sizes.split(",")]
+    shapes = args.shapes.split(",")
+    types = args.types.split(",")
+
+    results = []
+    tracemalloc.start()
+    for shape in shapes:
+        for size in sizes:
+            arrays = GENERATORS[shape](size)
+            for backend in backends:
+                for type in types:
+                    runs = [BACKENDS[backend](shape, arrays, type, args.dissolve)
+                            for _ in range(max(1, args.repeat))]
+                    record = min(runs, key=lambda r: r.get("time_apply", float("inf")))
+                    record.update(backend=backend, shape=shape, type=type,
+                                  faces=len(arrays[1]), verts=len(arrays[0]),
+                                  dissolve=args.dissolve)
+                    results.append(record)
+                    print("%-6s %-9s %9d faces  %-5s grid %8.3f ms  apply %8.3f ms  calls %s" % (
+                          backend, shape, record["faces"], type,
+                          1000*record.get("time_grid", float("nan")),
+                          1000*record.get("time_apply", float("nan")),
+                          sum(record.get("operator_calls", {}).values())))
+    tracemalloc.stop()
+
+    report = {
+        "addon_version" : addon_version(),
+        "python" : platform.python_version(),
+        "numpy" : np.__version__,
+        "platform" : platform.platform(),
+        "timestamp" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "max_rss_kb" : resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results" : results
+        }
+    if (args.output):
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    return report
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    main(argv)
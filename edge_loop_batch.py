@@ -0,0 +1,413 @@
+"""
+Apply reduction recipes to many mesh files from the command line.
+
+A recipe is a JSON file listing jobs. Each job names an input mesh, an
+output path and the operations to run on it in order:
+
+    {
+     "jobs" : [
+      {"input" : "assets/rock.obj",
+       "output" : "out/rock.obj",
+       "operations" : [
+        {"anchor" : 1042, "type" : "4to2", "directions" : ["+X", "-Y"]},
+        {"anchor" : [0.5, 1.0, 0.0], "type" : "3to1", "directions" : [2, -3],
+         "dissolve" : true},
+        {"anchors" : [12, 96, 180], "type" : "2to1", "directions" : [1, -2]}
+       ]}
+     ]
+    }
+
+An anchor is either a vertex index or a coordinate, which picks the
+nearest vertex. "anchors" applies the operation at several places like
+the add-on's batch mode. Vertex indices refer to the input file and stay
+valid across the operations of a job. With "audit" : true, a job's
+result also holds a topology audit of the faces each operation created
+and of the whole output mesh. Relative paths are resolved
+against the recipe's directory. OBJ and PLY (ASCII or binary) meshes are
+read and written with the headless core, and files are spread over a
+process pool:
+
+    python edge_loop_batch.py recipe.json --workers 64 --output results.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from edge_loop_reducer import edge_loop_core as core
+
+# Axis names accepted in recipes besides the integer panel encoding
+AXIS_NAMES = {
+        "+X" : 1, "-X" : -1,
+        "+Y" : 2, "-Y" : -2,
+        "+Z" : 3, "-Z" : -3
+        }
+
+PLY_TYPES = {
+        "char" : "i1", "int8" : "i1",
+        "uchar" : "u1", "uint8" : "u1",
+        "short" : "i2", "int16" : "i2",
+        "ushort" : "u2", "uint16" : "u2",
+        "int" : "i4", "int32" : "i4",
+        "uint" : "u4", "uint32" : "u4",
+        "float" : "f4", "float32" : "f4",
+        "double" : "f8", "float64" : "f8"
+        }
+
+def _csr_arrays(face_size, loop_vert):
+    """
+    Return (face_start, face_size, loop_vert) int64 arrays from face sizes
+    and the flat list of face corners.
+    """
+    face_size = np.asarray(face_size, dtype=np.int64)
+    face_start = np.zeros(len(face_size), dtype=np.int64)
+    if (len(face_size) > 1):
+        np.cumsum(face_size[:-1], out=face_start[1:])
+    return face_start, face_size, np.asarray(loop_vert, dtype=np.int64)
+
+def read_obj(path):
+    """
+    Read the vertices and faces of an OBJ file line by line into a
+    PolyMesh. Texture, normal, group and material statements are ignored.
+    """
+    co = []
+    face_size = []
+    loop_vert = []
+    with open(path, "r") as f:
+        for line in f:
+            if (line.startswith("v ")):
+                parts = line.split()
+                co.append((float(parts[1]), float(parts[2]), float(parts[3])))
+            elif (line.startswith("f ")):
+                corners = [int(p.split("/", 1)[0]) for p in line.split()[1:]]
+                num_verts = len(co)
+                loop_vert.extend(c - 1 if c > 0 else num_verts + c for c in corners)
+                face_size.append(len(corners))
+    co = np.array(co, dtype=np.float64).reshape(-1, 3)
+    return core.PolyMesh(co, *_csr_arrays(face_size, loop_vert))
+
+def write_obj(path, mesh):
+    """
+    Write the live geometry of a PolyMesh as an OBJ file.
+    """
+    mesh = mesh.compacted()
+    face_end = np.cumsum(mesh.face_size[:mesh.num_faces])
+    corners = (mesh.loop_vert[:int(face_end[-1]) if len(face_end) else 0] + 1).tolist()
+    with open(path, "w") as f:
+        for x, y, z in mesh.co[:mesh.num_verts].tolist():
+            f.write("v %.9g %.9g %.9g\n" % (x, y, z))
+        start = 0
+        for end in face_end.tolist():
+            f.write("f " + " ".join(map(str, corners[start:end])) + "\n")
+            start = end
+
+def _read_ply_header(f):
+    """
+    Parse a PLY header. Return (format, elements) where elements is a list
+    of (name, count, properties) and each property is (name, dtype) for a
+    scalar or (name, count_dtype, item_dtype) for a list.
+    """
+    if (f.readline().strip() != b"ply"):
+        raise ValueError("not a PLY file")
+    format = None
+    elements = []
+    while True:
+        line = f.readline()
+        if (not line):
+            raise ValueError("unterminated PLY header")
+        parts = line.decode("ascii").split()
+        if (not parts or parts[0] in ("comment", "obj_info")):
+            continue
+        if (parts[0] == "format"):
+            format = parts[1]
+        elif (parts[0] == "element"):
+            elements.append((parts[1], int(parts[2]), []))
+        elif (parts[0] == "property"):
+            if (parts[1] == "list"):
+                elements[-1][2].append((parts[4], PLY_TYPES[parts[2]], PLY_TYPES[parts[3]]))
+            else:
+                elements[-1][2].append((parts[2], PLY_TYPES[parts[1]]))
+        elif (parts[0] == "end_header"):
+            return format, elements
+
+def _face_property(properties):
+    """
+    Return the index of the vertex index list among face properties.
+    """
+    for i, prop in enumerate(properties):
+        if (len(prop) == 3 and prop[0] in ("vertex_indices", "vertex_index")):
+            return i
+    raise ValueError("PLY face element has no vertex_indices list")
+
+def _read_ply_ascii(f, elements):
+    co = None
+    face_size = []
+    loop_vert = []
+    for name, count, properties in elements:
+        if (name == "vertex"):
+            names = [p[0] for p in properties]
+            axes = [names.index(a) for a in ("x", "y", "z")]
+            lines = [f.readline() for _ in range(count)]
+            values = np.loadtxt(lines, dtype=np.float64, ndmin=2)
+            co = values[:, axes] if count else np.zeros((0, 3))
+        elif (name == "face"):
+            target = _face_property(properties)
+            for _ in range(count):
+                values = f.readline().split()
+                position = 0
+                for i, prop in enumerate(properties):
+                    if (len(prop) == 3):
+                        length = int(values[position])
+                        if (i == target):
+                            loop_vert.extend(map(int, values[position + 1:position + 1 + length]))
+                            face_size.append(length)
+                        position += 1 + length
+                    else:
+                        position += 1
+        else:
+            for _ in range(count):
+                f.readline()
+    return co, face_size, loop_vert
+
+def _read_ply_faces_binary(f, count, properties, endian):
+    """
+    Read a binary face element. When the index list comes first, the
+    other properties are scalars and every face has the size of the first
+    one, the element is read as a single structured array. Otherwise it
+    is read face by face.
+    """
+    target = _face_property(properties)
+    position = f.tell()
+    fixed = (target == 0 and count > 0
+             and all(len(p) == 2 for p in properties[1:]))
+    if (fixed):
+        name, count_type, item_type = properties[0]
+        count_type = np.dtype(endian + count_type)
+        length = int(np.frombuffer(f.read(count_type.itemsize), dtype=count_type)[0])
+        f.seek(position)
+        dtype = np.dtype([("count", count_type), ("indices", endian + item_type, (length,))]
+                         + [(p[0], endian + p[1]) for p in properties[1:]])
+        data = np.fromfile(f, dtype=dtype, count=count)
+        if (len(data) == count and (data["count"] == length).all()):
+            return np.full(count, length, dtype=np.int64), data["indices"].ravel()
+        f.seek(position)
+    face_size = np.empty(count, dtype=np.int64)
+    loop_vert = []
+    for face in range(count):
+        for i, prop in enumerate(properties):
+            if (len(prop) == 3):
+                size = np.dtype(endian + prop[1])
+                length = int(np.frombuffer(f.read(size.itemsize), dtype=size)[0])
+                item = np.dtype(endian + prop[2])
+                values = np.frombuffer(f.read(item.itemsize * length), dtype=item)
+                if (i == target):
+                    face_size[face] = length
+                    loop_vert.append(values)
+            else:
+                f.read(np.dtype(prop[1]).itemsize)
+    loop_vert = np.concatenate(loop_vert) if loop_vert else np.zeros(0, dtype=np.int64)
+    return face_size, loop_vert
+
+def read_ply(path):
+    """
+    Read the vertices and faces of an ASCII or binary PLY file into a
+    PolyMesh. Elements other than vertex and face are skipped.
+    """
+    with open(path, "rb") as f:
+        format, elements = _read_ply_header(f)
+        if (format == "ascii"):
+            co, face_size, loop_vert = _read_ply_ascii(f, elements)
+        else:
+            endian = "<" if format == "binary_little_endian" else ">"
+            co = None
+            face_size, loop_vert = [], []
+            for name, count, properties in elements:
+                if (name == "face"):
+                    face_size, loop_vert = _read_ply_faces_binary(f, count, properties, endian)
+                    continue
+                if (any(len(p) == 3 for p in properties)):
+                    raise ValueError("unsupported list property in PLY element '%s'" % name)
+                dtype = np.dtype([(p[0], endian + p[1]) for p in properties])
+                data = np.fromfile(f, dtype=dtype, count=count)
+                if (name == "vertex"):
+                    co = np.stack([data[a] for a in ("x", "y", "z")], axis=1).astype(np.float64)
+    if (co is None):
+        raise ValueError("PLY file has no vertex element")
+    return core.PolyMesh(co, *_csr_arrays(face_size, loop_vert))
+
+def write_ply(path, mesh):
+    """
+    Write the live geometry of a PolyMesh as a binary little endian PLY.
+    """
+    mesh = mesh.compacted()
+    num_verts, num_faces = mesh.num_verts, mesh.num_faces
+    sizes = mesh.face_size[:num_faces]
+    loops = mesh.loop_vert[:int(sizes.sum())].astype("<i4")
+    # Each face is a uchar count followed by its int32 corners
+    face_bytes = 1 + 4*sizes
+    byte_start = np.zeros(num_faces, dtype=np.int64)
+    if (num_faces > 1):
+        np.cumsum(face_bytes[:-1], out=byte_start[1:])
+    out = np.empty(int(face_bytes.sum()), dtype=np.uint8)
+    out[byte_start] = sizes
+    corner = np.arange(len(loops)) - np.repeat(mesh.face_start[:num_faces], sizes)
+    loop_bytes = np.repeat(byte_start + 1, sizes) + 4*corner
+    out[loop_bytes[:, None] + np.arange(4)] = loops.view(np.uint8).reshape(-1, 4)
+    header = ("ply\nformat binary_little_endian 1.0\n"
+              "element vertex %d\nproperty float x\nproperty float y\nproperty float z\n"
+              "element face %d\nproperty list uchar int vertex_indices\nend_header\n"
+              % (num_verts, num_faces))
+    with open(path, "wb") as f:
+        f.write(header.encode("ascii"))
+        f.write(mesh.co[:num_verts].astype("<f4").tobytes())
+        f.write(out.tobytes())
+
+READERS = {".obj" : read_obj, ".ply" : read_ply}
+WRITERS = {".obj" : write_obj, ".ply" : write_ply}
+
+def _format(path, table):
+    extension = os.path.splitext(path)[1].lower()
+    if (extension not in table):
+        raise ValueError("unsupported mesh format '%s'" % extension)
+    return table[extension]
+
+def parse_direction(value):
+    """
+    Return the integer axis for a panel-style integer or a name like "-Y".
+    """
+    if (isinstance(value, str)):
+        value = AXIS_NAMES[value.upper()] if value.upper() in AXIS_NAMES else int(value)
+    if (value not in (1, -1, 2, -2, 3, -3)):
+        raise ValueError("invalid direction %r" % value)
+    return value
+
+def resolve_anchor(mesh, anchor):
+    """
+    Return the vertex index of an anchor given as an index or as the
+    coordinate of the nearest live vertex.
+    """
+    if (isinstance(anchor, int)):
+        if (anchor < 0 or anchor >= mesh.num_verts or not mesh.vert_alive[anchor]):
+            raise ValueError("anchor vertex %d does not exist" % anchor)
+        return anchor
+    alive = np.flatnonzero(mesh.vert_alive[:mesh.num_verts])
+    distance = ((mesh.co[alive] - np.asarray(anchor, dtype=np.float64))**2).sum(axis=1)
+    return int(alive[np.argmin(distance)])
+
+def apply_operation(mesh, operation):
+    """
+    Apply one recipe operation to mesh and return the number of
+    reductions applied.
+    """
+    type = operation["type"]
+    if (not core.has_pattern(type)):
+        raise ValueError("unknown reduction type '%s'" % type)
+    directions = tuple(parse_direction(d) for d in operation["directions"])
+    dissolve = bool(operation.get("dissolve", False))
+    if ("anchors" in operation):
+        anchors = [resolve_anchor(mesh, a) for a in operation["anchors"]]
+        return core.reduce_many(mesh, anchors, type, directions, dissolve)
+    anchor = resolve_anchor(mesh, operation["anchor"])
+    return int(core.reduce(mesh, anchor, type, directions, dissolve))
+
+def run_job(job):
+    """
+    Load, reduce and save the mesh of one job. Return a result record with
+    the number of reductions per operation and the time of every phase.
+    Errors are reported in the record rather than raised, so one broken
+    file does not stop the batch.
+    """
+    result = {"input" : job["input"], "output" : job.get("output"), "pid" : os.getpid()}
+    timings = {}
+    start = time.perf_counter()
+    try:
+        mesh = _format(job["input"], READERS)(job["input"])
+        timings["load"] = time.perf_counter() - start
+        result["verts_in"], result["faces_in"] = mesh.num_verts, mesh.num_faces
+
+        phase_start = time.perf_counter()
+        result["applied"] = []
+        audits = []
+        for operation in job.get("operations", []):
+            first_face = mesh.num_faces
+            result["applied"].append(apply_operation(mesh, operation))
+            if (job.get("audit")):
+                audits.append(core.audit(mesh, np.arange(first_face, mesh.num_faces)))
+        timings["apply"] = time.perf_counter() - phase_start
+        if (job.get("audit")):
+            result["audits"] = audits
+            result["audit"] = core.audit(mesh)
+
+        if (job.get("output")):
+            phase_start = time.perf_counter()
+            _format(job["output"], WRITERS)(job["output"], mesh)
+            timings["save"] = time.perf_counter() - phase_start
+        result["ok"] = True
+    except Exception as error:
+        result["ok"] = False
+        result["error"] = "%s: %s" % (type(error).__name__, error)
+    timings["total"] = time.perf_counter() - start
+    result["timings"] = timings
+    return result
+
+def load_recipe(path):
+    """
+    Read a recipe file and return its jobs with paths made absolute.
+    """
+    with open(path, "r") as f:
+        recipe = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = recipe["jobs"] if isinstance(recipe, dict) else recipe
+    for job in jobs:
+        for key in ("input", "output"):
+            if (job.get(key)):
+                job[key] = os.path.join(base, job[key])
+    return jobs
+
+def run_jobs(jobs, workers):
+    """
+    Run jobs over a pool of worker processes, or in this process when
+    workers is 1. Results come back in recipe order.
+    """
+    if (workers <= 1 or len(jobs) <= 1):
+        return [run_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(run_job, jobs))
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("recipe", help="JSON recipe listing the jobs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: one per core)")
+    parser.add_argument("--output", help="write per-file results and timings as JSON")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    jobs = load_recipe(args.recipe)
+    start = time.perf_counter()
+    results = run_jobs(jobs, args.workers)
+    wall = time.perf_counter() - start
+    for result in results:
+        if (result["ok"]):
+            print("%-40s %8.3f s  applied %s" % (os.path.basename(result["input"]),
+                  result["timings"]["total"], result["applied"]))
+        else:
+            print("%-40s FAILED  %s" % (os.path.basename(result["input"]), result["error"]))
+    failed = sum(not r["ok"] for r in results)
+    print("%d files, %d failed, %.3f s wall, %.3f s total work, %d workers" % (
+          len(results), failed, wall, sum(r["timings"]["total"] for r in results),
+          args.workers))
+    if (args.output):
+        with open(args.output, "w") as f:
+            json.dump({"wall_time" : wall, "workers" : args.workers, "results" : results},
+                      f, indent=1)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,23 @@
+bl_info = {
+    "name": "Edge Loop Reducer",
+    "author": "Ben Bartschi",
+    "version": (1, 0),
+    "blender": (2, 80, 0),
+    "location": "View3D > N",
+    "description": "Quickly repologizes faces for proper edge loop reduction",
+    "warning": "",
+    "wiki_url": "",
+    "category": "",
+}
+
+# The operators live in edge_loop_reduce, which needs bpy. It is imported
+# on registration so that edge_loop_core, which does not, can be imported
+# from this package outside Blender.
+
+def register():
+    from . import edge_loop_reduce
+    edge_loop_reduce.register()
+
+def unregister():
+    from . import edge_loop_reduce
+    edge_loop_reduce.unregister()
@@ -0,0 +1,1682 @@
+"""
+Headless mesh core for the Edge Loop Reducer.
+
+Everything in this module runs on plain NumPy arrays and never imports
+bpy or bmesh, so the reductions can be applied and tested outside of
+Blender. PolyMesh stores vertex coordinates in an array, faces as CSR
+loop arrays (like bpy.types.Mesh polygons) and a lazily built CSR
+vertex-to-face index. The functions below mirror the grid walk of the
+add-on, and the reductions themselves are data: pattern_definitions
+are compiled into weight matrices and index templates that both the
+add-on and apply_pattern execute.
+"""
+
+import functools
+import hashlib
+import json
+import time
+
+import numpy as np
+
+def lerp(a, b, t):
+    """
+    Terms of the point a + (b - a)*t.
+    """
+    return [(a, 1 - t), (b, t)]
+
+def offset(a, b, t):
+    """
+    Terms of the vector (b - a)*t.
+    """
+    return [(b, t), (a, -t)]
+
+# Each pattern is data over a grid of (rows x columns) faces. Grid vertices
+# are (row, column) tuples, and points are named strings defined as weighted
+# terms over grid vertices and earlier points. Steps run in order, then
+# "moves" place grid vertices on points, "new_verts" are created at points,
+# "faces" are built from grid vertices and new verts, and with dissolve
+# enabled the "dissolve" vertices are removed.
+pattern_definitions = {
+        "1to2" : {
+            "grid" : (1, 1),
+            "points" : [
+                ("v1", lerp((0,0), (0,1), .5)),
+                ("v2", lerp((0,0), (1,0), 1/3)),
+                ("v4", lerp((0,1), (1,1), 1/3)),
+                ("v3", lerp("v2", "v4", .5)),
+                ("v5", lerp((0,0), (1,0), .66)),
+                ("v6", lerp((0,1), (1,1), .66)),
+                ("v7", lerp("v5", "v2", .5) + offset((0,0), (0,1), 1/3)),
+                ("v8", lerp("v5", "v2", .5) + offset((0,0), (0,1), .66))],
+            "steps" : [
+                ("delete", {"faces" : [[(0,0), (0,1), (1,0), (1,1)]],
+                            "edges" : [((0,0), (0,1)), ((0,0), (1,0)),
+                                       ((1,0), (1,1)), ((0,1), (1,1))]})],
+            "new_verts" : ["v1", "v2", "v4", "v3", "v5", "v6", "v7", "v8"],
+            "faces" : [((0,0), "v1", "v3", "v2"),
+                       ("v1", (0,1), "v4", "v3"),
+                       ("v2", "v3", "v7", "v5"),
+                       ("v3", "v4", "v6", "v8"),
+                       ("v3", "v7", "v8"),
+                       ("v7", "v8", "v6", "v5"),
+                       ("v5", "v6", (1,1), (1,0))]
+            },
+        "1to3" : {
+            "grid" : (1, 1),
+            "points" : [
+                ("v1", lerp((0,0), (0,1), .33)),
+                ("v2", lerp((0,0), (0,1), .66)),
+                ("v3", lerp((0,0), (1,0), 1/3)),
+                ("v6", lerp((0,1), (1,1), 1/3)),
+                ("v4", lerp("v3", "v6", .33)),
+                ("v5", lerp("v3", "v6", .66)),
+                ("v7", lerp((0,0), (1,0), .66)),
+                ("v10", lerp((0,1), (1,1), .66)),
+                ("v8", lerp("v7", "v3", .5) + offset((0,0), (0,1), 1/3)),
+                ("v9", lerp("v7", "v3", .5) + offset((0,0), (0,1), .66))],
+            "steps" : [
+                ("delete", {"faces" : [[(0,0), (0,1), (1,0), (1,1)]],
+                            "edges" : [((0,0), (0,1)), ((0,0), (1,0)),
+                                       ((1,0), (1,1)), ((0,1), (1,1))]})],
+            "new_verts" : ["v1", "v2", "v3", "v6", "v4", "v5", "v7", "v10", "v8", "v9"],
+            "faces" : [((0,0), "v1", "v4", "v3"),
+                       ("v1", "v2", "v5", "v4"),
+                       ("v2", (0,1), "v6", "v5"),
+                       ("v3", "v4", "v8", "v7"),
+                       ("v4", "v5", "v9", "v8"),
+                       ("v5", "v6", "v10", "v9"),
+                       ("v7", "v8", "v9", "v10"),
+                       ("v7", "v10", (1,1), (1,0))]
+            },
+        "1to4" : {
+            "grid" : (1, 1),
+            "points" : [
+                ("v1", lerp((0,0), (0,1), .25)),
+                ("v2", lerp((0,0), (0,1), .5)),
+                ("v3", lerp((0,0), (0,1), .75)),
+                ("v4", lerp((0,0), (1,0), 1/3)),
+                ("v8", lerp((0,1), (1,1), 1/3)),
+                ("v5", lerp("v4", "v8", .25)),
+                ("v6", lerp("v4", "v8", .5)),
+                ("v7", lerp("v4", "v8", .75)),
+                ("v9", lerp((0,0), (1,0), .66)),
+                ("v13", lerp((0,1), (1,1), .66)),
+                ("v10", lerp("v9", "v13", .35) + offset("v9", "v4", .5)),
+                ("v12", lerp("v9", "v13", .65) + offset("v9", "v4", .5))],
+            "steps" : [
+                ("delete", {"faces" : [[(0,0), (0,1), (1,0), (1,1)]],
+                            "edges" : [((0,0), (0,1)), ((0,0), (1,0)),
+                                       ((1,0), (1,1)), ((0,1), (1,1))]})],
+            "new_verts" : ["v1", "v2", "v3", "v4", "v8", "v5", "v6", "v7",
+                           "v9", "v13", "v10", "v12"],
+            "faces" : [((0,0), "v1", "v5", "v4"),
+                       ("v1", "v2", "v6", "v5"),
+                       ("v2", "v3", "v7", "v6"),
+                       ("v3", (0,1), "v8", "v7"),
+                       ("v4", "v5", "v10", "v9"),
+                       ("v5", "v6", "v7", "v12", "v10"),
+                       ("v7", "v8", "v13", "v12"),
+                       ("v9", "v10", "v12", "v13"),
+                       ("v9", "v13", (1,1), (1,0))]
+            },
+        "3to1" : {
+            "grid" : (3, 3),
+            "points" : [
+                ("p21", lerp((2,1), (1,1), .5)),
+                ("p22", lerp((2,2), (1,2), .5))],
+            "steps" : [
+                ("dissolve_edges", [((3,1), (2,1)), ((3,2), (2,2))]),
+                ("connect_verts", [((2,0), (2,3))])],
+            "moves" : [((2,1), "p21"), ((2,2), "p22")],
+            "dissolve" : [(3,1), (3,2)]
+            },
+        "4to1" : {
+            "grid" : (3, 4),
+            "points" : [
+                ("a21", lerp((2,1), (1,1), .5)),
+                ("a23", lerp((2,3), (1,3), .5)),
+                ("p21", lerp("a21", "a23", .25)),
+                ("p23", lerp("a23", "a21", .25))],
+            "steps" : [
+                ("dissolve_edges", [((3,1), (2,1)), ((3,2), (2,2)), ((3,3), (2,3))]),
+                ("dissolve_verts", [(2,2)]),
+                ("connect_verts", [((2,0), (2,4)), ((2,1), (2,3))])],
+            "moves" : [((2,1), "p21"), ((2,3), "p23")],
+            "dissolve" : [(3,1), (3,2), (3,3)]
+            },
+        "2to1" : {
+            "grid" : (3, 2),
+            "points" : [
+                ("p21", lerp((2,1), (1,1), .5) + offset((1,1), (1,0), 1/3)),
+                ("n", [("p21", 1)] + offset((1,1), (1,0), -2/3))],
+            "steps" : [
+                ("dissolve_edges", [((3,1), (2,1))]),
+                ("connect_verts", [((2,0), (2,2))]),
+                ("delete", {"faces" : [[(2,0), (2,2), (2,1)],
+                                       [(1,1), (2,1), (2,2), (1,2)]]})],
+            "moves" : [((2,1), "p21")],
+            "new_verts" : ["n"],
+            "faces" : [((2,0), (2,1), "n", (2,2)),
+                       ((1,1), (2,1), "n"),
+                       ((1,1), (1,2), (2,2), "n")],
+            "dissolve" : [(3,1)]
+            },
+        "4to2" : {
+            "grid" : (3, 4),
+            "points" : [
+                ("p21", lerp((2,1), (1,1), .5)),
+                ("p22", lerp((2,2), (1,2), .5)),
+                ("p23", lerp((2,3), (1,3), .5)),
+                ("n", lerp((2,0), (2,4), .5))],
+            "steps" : [
+                ("dissolve_edges", [((3,1), (2,1)), ((3,3), (2,3))]),
+                ("delete", {"faces" : [[(3,0), (2,0), (2,1), (2,2), (3,2), (3,1)],
+                                       [(3,2), (2,2), (3,4), (2,3), (2,4), (3,3)]]})],
+            "moves" : [((2,1), "p21"), ((2,2), "p22"), ((2,3), "p23")],
+            "new_verts" : ["n"],
+            "faces" : [((3,0), (2,0), "n", (3,2), (3,1)),
+                       ((3,2), "n", (2,4), (3,4), (3,3)),
+                       ((2,0), (2,1), (2,2), "n"),
+                       ((2,2), (2,3), (2,4), "n")]
+            },
+        "5to3" : {
+            "grid" : (3, 5),
+            "points" : [
+                ("p21", lerp((2,1), (1,1), .5)),
+                ("p22", lerp((2,2), (1,2), .5)),
+                ("p23", lerp((2,3), (1,3), .5)),
+                ("p24", lerp((2,4), (1,4), .5)),
+                ("p32", lerp((3,0), (3,5), .33)),
+                ("p33", lerp((3,0), (3,5), .66)),
+                ("n1", lerp((2,0), (2,5), .33)),
+                ("n2", lerp((2,0), (2,5), .66))],
+            "steps" : [
+                ("dissolve_edges", [((3,1), (2,1)), ((3,4), (2,4))]),
+                ("delete", {"faces" : [[(3,0), (2,0), (2,1), (2,2), (3,2), (3,1)],
+                                       [(2,2), (2,3), (3,3), (3,2)],
+                                       [(2,3), (2,4), (2,5), (3,5), (3,4), (3,3)]]})],
+            "moves" : [((2,1), "p21"), ((2,2), "p22"), ((2,3), "p23"), ((2,4), "p24"),
+                       ((3,2), "p32"), ((3,3), "p33")],
+            "new_verts" : ["n1", "n2"],
+            "faces" : [((2,0), (2,1), (2,2), "n1"),
+                       ((2,2), (2,3), "n2", "n1"),
+                       ((2,3), (2,4), (2,5), "n2"),
+                       ("n2", (2,5), (3,5), (3,3)),
+                       ("n1", "n2", (3,3), (3,2)),
+                       ((2,0), "n1", (3,2), (3,0))],
+            "dissolve" : [(3,1), (3,4)]
+            }
+        }
+
+class Pattern:
+    """
+    A pattern compiled for a grid of (num_rows x num_columns) vertices.
+    Grid vertices are numbered row-major. weights maps the grid
+    coordinates to every point, so all positions come from one matrix
+    product. faces index the grid vertices followed by the new verts.
+    """
+    __slots__ = ("name", "num_rows", "num_columns", "weights", "steps",
+                 "move_cells", "move_points", "new_points",
+                 "face_sizes", "face_loops", "dissolve_cells")
+
+    def points(self, grid_co):
+        """
+        Return the position of every point for a (cells x 3) coordinate
+        array, or for a stack of them.
+        """
+        return self.weights @ grid_co
+
+    def faces(self):
+        """
+        Return the face templates as lists of indices.
+        """
+        starts = np.cumsum(self.face_sizes) - self.face_sizes
+        return [self.face_loops[s:s + n].tolist() for s, n in zip(starts, self.face_sizes)]
+
+    def placed_points(self):
+        """
+        Return the indices of the points that move a grid vertex or
+        create a new one.
+        """
+        return np.union1d(self.move_points, self.new_points)
+
+def compile_pattern(name, definition):
+    """
+    Turn a pattern definition into a Pattern with a NumPy weight matrix
+    and index templates.
+    """
+    num_rows = definition["grid"][0] + 1
+    num_columns = definition["grid"][1] + 1
+    num_cells = num_rows*num_columns
+
+    def cell(ref):
+        row, column = ref
+        if (not (0 <= row < num_rows and 0 <= column < num_columns)):
+            raise ValueError("%s: %r is outside the grid" % (name, ref))
+        return row*num_columns + column
+
+    point_index = {}
+    weights = np.zeros((len(definition.get("points", [])), num_cells))
+    for i, (point, terms) in enumerate(definition.get("points", [])):
+        for ref, weight in terms:
+            if (isinstance(ref, str)):
+                weights[i] += weight*weights[point_index[ref]]
+            else:
+                weights[i, cell(ref)] += weight
+        point_index[point] = i
+
+    new_verts = definition.get("new_verts", [])
+    new_index = {point: num_cells + i for i, point in enumerate(new_verts)}
+    def vert(ref):
+        return new_index[ref] if isinstance(ref, str) else cell(ref)
+
+    steps = []
+    for op, args in definition.get("steps", []):
+        if (op == "delete"):
+            args = {"faces" : [[cell(r) for r in group] for group in args.get("faces", [])],
+                    "edges" : [(cell(a), cell(b)) for a, b in args.get("edges", [])]}
+        elif (op in ("dissolve_edges", "connect_verts")):
+            args = [(cell(a), cell(b)) for a, b in args]
+        elif (op == "dissolve_verts"):
+            args = [cell(r) for r in args]
+        else:
+            raise ValueError("%s: unknown step %r" % (name, op))
+        steps.append((op, args))
+
+    faces = definition.get("faces", [])
+    pattern = Pattern()
+    pattern.name = name
+    pattern.num_rows = num_rows
+    pattern.num_columns = num_columns
+    pattern.weights = weights
+    pattern.steps = steps
+    moves = definition.get("moves", [])
+    pattern.move_cells = np.array([cell(r) for r, p in moves], dtype=np.int64)
+    pattern.move_points = np.array([point_index[p] for r, p in moves], dtype=np.int64)
+    pattern.new_points = np.array([point_index[p] for p in new_verts], dtype=np.int64)
+    pattern.face_sizes = np.array([len(f) for f in faces], dtype=np.int64)
+    pattern.face_loops = np.array([vert(r) for f in faces for r in f], dtype=np.int64)
+    pattern.dissolve_cells = np.array([cell(r) for r in definition.get("dissolve", [])],
+                                      dtype=np.int64)
+    return pattern
+
+# Reductions a synthesized N to M pattern is tiled from, with their cost.
+# Blocks leaving a triangle or an n-gon cost more than all-quad ones, and
+# a column passed through unchanged costs almost nothing.
+_reduction_blocks = {"3to1": 1, "4to2": 1, "5to3": 1, "2to1": 2, "4to1": 2}
+_KEEP_COST = 0.01
+
+def _ratio(name):
+    """
+    Return the (from, to) face counts of a pattern name like "6to2".
+    """
+    parts = name.split("to")
+    if (len(parts) != 2 or not all(part.isdigit() for part in parts)):
+        raise KeyError("%r is not a pattern name of the form NtoM" % name)
+    return int(parts[0]), int(parts[1])
+
+# The pass-through column followed by the blocks, as (name, from, to, cost)
+_plan_options = [(None, 1, 1, _KEEP_COST)] + [(name,) + _ratio(name) + (cost,)
+                                             for name, cost in _reduction_blocks.items()]
+
+@functools.lru_cache(maxsize=256)
+def _plan_reduction(num_from, num_to):
+    """
+    Return the cheapest (cost, blocks) tiling a reduction of num_from
+    columns to num_to side by side, or None if there is none. blocks
+    names the reduction of each block from left to right, with None for
+    a column passed through. The table of the cheapest tiling of every
+    smaller reduction is filled one row of from counts at a time, each
+    option tried for all to counts at once.
+    """
+    cost = np.full((num_from + 1, num_to + 1), np.inf)
+    choice = np.full((num_from + 1, num_to + 1), -1, dtype=np.int8)
+    cost[0, 0] = 0.0
+    for row in range(1, num_from + 1):
+        best = cost[row]
+        for option, (name, block_from, block_to, block_cost) in enumerate(_plan_options):
+            if (block_from > row or block_to > num_to):
+                continue
+            candidate = np.full(num_to + 1, np.inf)
+            candidate[block_to:] = cost[row - block_from, :num_to + 1 - block_to] + block_cost
+            better = candidate < best
+            best[better] = candidate[better]
+            choice[row, better] = option
+    if (not np.isfinite(cost[num_from, num_to])):
+        return None
+    blocks = []
+    remaining_from, remaining_to = num_from, num_to
+    while (remaining_from or remaining_to):
+        name, block_from, block_to, _ = _plan_options[choice[remaining_from, remaining_to]]
+        blocks.append(name)
+        remaining_from -= block_from
+        remaining_to -= block_to
+    return (float(cost[num_from, num_to]), tuple(blocks))
+
+def compose_reduction(num_from, num_to):
+    """
+    Return a pattern definition reducing num_from faces to num_to over a
+    (3 x num_from) grid. The grid is tiled with the primitive reductions,
+    which only change vertices inside their own columns, so their points,
+    steps and faces are shifted into place and run one block after the
+    other.
+    """
+    plan = _plan_reduction(num_from, num_to) if num_from > num_to > 0 else None
+    if (plan is None):
+        raise KeyError("no reduction from %d to %d faces can be built" % (num_from, num_to))
+    definition = {"grid" : (3, num_from), "points" : [], "steps" : [], "moves" : [],
+                  "new_verts" : [], "faces" : [], "dissolve" : []}
+    column = 0
+    for i, name in enumerate(plan[1]):
+        if (name is None):
+            column += 1
+            continue
+        block = pattern_definitions[name]
+
+        def ref(r, i=i, column=column):
+            if (isinstance(r, str)):
+                return "%d:%s" % (i, r)
+            return (r[0], r[1] + column)
+
+        for point, terms in block.get("points", []):
+            definition["points"].append((ref(point), [(ref(r), w) for r, w in terms]))
+        for op, args in block.get("steps", []):
+            if (op == "delete"):
+                args = {"faces" : [[ref(r) for r in group] for group in args.get("faces", [])],
+                        "edges" : [(ref(a), ref(b)) for a, b in args.get("edges", [])]}
+            elif (op == "dissolve_verts"):
+                args = [ref(r) for r in args]
+            else:
+                args = [(ref(a), ref(b)) for a, b in args]
+            definition["steps"].append((op, args))
+        definition["moves"] += [(ref(r), ref(p)) for r, p in block.get("moves", [])]
+        definition["new_verts"] += [ref(p) for p in block.get("new_verts", [])]
+        definition["faces"] += [tuple(ref(r) for r in f) for f in block.get("faces", [])]
+        definition["dissolve"] += [ref(r) for r in block.get("dissolve", [])]
+        column += block["grid"][1]
+    return definition
+
+@functools.lru_cache(maxsize=64)
+def synthesize_pattern(name):
+    """
+    Compile the reduction for a pattern name like "6to2" that has no
+    definition of its own. Raise KeyError if it cannot be built.
+    """
+    return compile_pattern(name, compose_reduction(*_ratio(name)))
+
+class _PatternTable(dict):
+    """
+    Compiled patterns by name. Names of the form "NtoM" without a
+    definition are synthesized on first use.
+    """
+    def __missing__(self, name):
+        return synthesize_pattern(name)
+
+class _GridTable(dict):
+    """
+    Grid sizes by pattern name, synthesizing the pattern like _PatternTable.
+    """
+    def __missing__(self, name):
+        pattern = synthesize_pattern(name)
+        return [pattern.num_rows - 1, pattern.num_columns - 1]
+
+patterns = _PatternTable((name, compile_pattern(name, definition))
+                         for name, definition in pattern_definitions.items())
+
+# Defines the minimum number of existing vertices to perform each operation
+type_definitions = _GridTable((name, list(definition["grid"]))
+                              for name, definition in pattern_definitions.items())
+
+def has_pattern(name):
+    """
+    Return True if name is a defined pattern or one that can be synthesized.
+    """
+    try:
+        patterns[name]
+    except KeyError:
+        return False
+    return True
+
+def _reserve(array, size):
+    """
+    Return array grown (by doubling) so it holds at least size rows.
+    """
+    if (len(array) >= size):
+        return array
+    capacity = max(size, 2*len(array), 16)
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+class PolyMesh:
+    """
+    An editable polygon mesh backed by NumPy arrays.
+
+    Faces are stored as CSR loops: the vertices of face f are
+    loop_vert[face_start[f]:face_start[f] + face_size[f]]. Removed faces
+    and vertices are only flagged dead, so indices stay stable until
+    compact() is called. Edges are implied by consecutive face vertices;
+    wire edges are not represented.
+    """
+    __slots__ = ("co", "vert_alive", "num_verts",
+                 "face_start", "face_size", "face_alive", "num_faces",
+                 "loop_vert", "num_loops", "topology_version",
+                 "_vf_offsets", "_vf_faces", "_vf_num_verts", "_vf_num_faces",
+                 "_vf_extra", "_neighbor_cache", "_half_edge_cache", "_walk_cache",
+                 "_site_cache")
+
+    def __init__(self, co, face_start, face_size, loop_vert):
+        co = np.asarray(co, dtype=np.float64).reshape(-1, 3)
+        self.co = co.copy()
+        self.num_verts = len(co)
+        self.vert_alive = np.ones(self.num_verts, dtype=bool)
+        self.face_start = np.asarray(face_start, dtype=np.int64).copy()
+        self.face_size = np.asarray(face_size, dtype=np.int64).copy()
+        self.num_faces = len(self.face_start)
+        self.face_alive = np.ones(self.num_faces, dtype=bool)
+        self.loop_vert = np.asarray(loop_vert, dtype=np.int64).copy()
+        self.num_loops = len(self.loop_vert)
+        self.topology_version = 0
+        self._vf_offsets = None
+        self._vf_faces = None
+        self._vf_num_verts = 0
+        self._vf_num_faces = 0
+        self._vf_extra = {}
+        self._neighbor_cache = None
+        self._half_edge_cache = None
+        self._walk_cache = {}
+        self._site_cache = {}
+
+    @classmethod
+    def from_pydata(cls, verts, faces):
+        """
+        Build a mesh from a list of coordinates and a list of faces,
+        each face being a sequence of vertex indices.
+        """
+        face_size = np.fromiter((len(f) for f in faces), dtype=np.int64, count=len(faces))
+        face_start = np.zeros(len(faces), dtype=np.int64)
+        if (len(faces) > 1):
+            np.cumsum(face_size[:-1], out=face_start[1:])
+        loop_vert = np.fromiter((v for f in faces for v in f), dtype=np.int64,
+                                count=int(face_size.sum()))
+        return cls(verts, face_start, face_size, loop_vert)
+
+    def to_pydata(self):
+        """
+        Return (verts, faces) lists for the live geometry,
+        with vertex indices renumbered to skip dead vertices.
+        """
+        mesh = self.compacted()
+        verts = mesh.co[:mesh.num_verts].tolist()
+        faces = [mesh.face_verts(f).tolist() for f in range(mesh.num_faces)]
+        return verts, faces
+
+    def compacted(self):
+        """
+        Return a copy of the mesh without dead faces and vertices.
+        """
+        remap = np.full(self.num_verts, -1, dtype=np.int64)
+        alive = np.flatnonzero(self.vert_alive[:self.num_verts])
+        remap[alive] = np.arange(len(alive))
+        faces = np.flatnonzero(self.face_alive[:self.num_faces])
+        sizes = self.face_size[faces]
+        loops = _face_loop_indices(self.face_start[faces], sizes)
+        face_start = np.zeros(len(faces), dtype=np.int64)
+        if (len(faces) > 1):
+            np.cumsum(sizes[:-1], out=face_start[1:])
+        return PolyMesh(self.co[alive], face_start, sizes, remap[self.loop_vert[loops]])
+
+    def face_verts(self, face):
+        """
+        Return the vertex indices of a face in winding order.
+        """
+        start = self.face_start[face]
+        return self.loop_vert[start:start + self.face_size[face]]
+
+    def live_faces(self):
+        """
+        Return the indices of every live face.
+        """
+        return np.flatnonzero(self.face_alive[:self.num_faces])
+
+    def _ensure_vert_faces(self):
+        """
+        Build the CSR vertex-to-face index for the current faces.
+        Faces added afterwards are tracked in a small overlay instead.
+        """
+        if (self._vf_offsets is not None):
+            return
+        num_faces = self.num_faces
+        sizes = self.face_size[:num_faces]
+        loop_face = np.repeat(np.arange(num_faces), sizes)
+        loop_vert = self.loop_vert[_face_loop_indices(self.face_start[:num_faces], sizes)]
+        order = np.argsort(loop_vert, kind="stable")
+        counts = np.bincount(loop_vert, minlength=self.num_verts)
+        offsets = np.zeros(self.num_verts + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        self._vf_offsets = offsets
+        self._vf_faces = loop_face[order]
+        self._vf_num_verts = self.num_verts
+        self._vf_num_faces = num_faces
+        self._vf_extra = {}
+
+    def vert_faces(self, vert):
+        """
+        Return the live faces using a vertex.
+        """
+        self._ensure_vert_faces()
+        faces = []
+        if (vert < self._vf_num_verts):
+            start, end = self._vf_offsets[vert], self._vf_offsets[vert + 1]
+            faces = [int(f) for f in self._vf_faces[start:end] if self.face_alive[f]]
+        for f in self._vf_extra.get(vert, ()):
+            if (self.face_alive[f] and f not in faces):
+                faces.append(f)
+        return faces
+
+    def vert_neighbors(self, vert):
+        """
+        Return the vertices sharing a face edge with vert.
+        """
+        neighbors = []
+        for f in self.vert_faces(vert):
+            verts = self.face_verts(f)
+            i = int(np.flatnonzero(verts == vert)[0])
+            for other in (verts[i - 1], verts[(i + 1) % len(verts)]):
+                other = int(other)
+                if (other not in neighbors):
+                    neighbors.append(other)
+        return neighbors
+
+    def neighbor_csr(self):
+        """
+        Return (offsets, neighbors) CSR arrays listing the vertices that
+        share a face edge with each vertex. Built with array operations and
+        cached until the topology changes.
+        """
+        cache = self._neighbor_cache
+        if (cache is not None and cache[0] == self.topology_version):
+            return cache[1], cache[2]
+        tail, head = self.edge_pairs()
+        num_verts = np.int64(self.num_verts)
+        keys = np.concatenate([tail*num_verts + head, head*num_verts + tail])
+        keys.sort()
+        keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+        offsets = np.zeros(self.num_verts + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys//num_verts, minlength=self.num_verts), out=offsets[1:])
+        neighbors = keys % num_verts
+        self._neighbor_cache = (self.topology_version, offsets, neighbors)
+        return offsets, neighbors
+
+    def edge_faces(self, vert_a, vert_b):
+        """
+        Return the live faces containing the edge between two vertices.
+        """
+        faces = []
+        for f in self.vert_faces(vert_a):
+            verts = self.face_verts(f)
+            i = int(np.flatnonzero(verts == vert_a)[0])
+            if (verts[i - 1] == vert_b or verts[(i + 1) % len(verts)] == vert_b):
+                faces.append(f)
+        return faces
+
+    def faces_within(self, verts):
+        """
+        Return every live face whose vertices are all contained in verts.
+        """
+        vert_set = set(int(v) for v in verts)
+        faces = []
+        for v in vert_set:
+            for f in self.vert_faces(v):
+                if (f not in faces and vert_set.issuperset(self.face_verts(f).tolist())):
+                    faces.append(f)
+        return faces
+
+    def add_verts(self, coords):
+        """
+        Append vertices and return their indices.
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        start = self.num_verts
+        end = start + len(coords)
+        self.co = _reserve(self.co, end)
+        self.vert_alive = _reserve(self.vert_alive, end)
+        self.co[start:end] = coords
+        self.vert_alive[start:end] = True
+        self.num_verts = end
+        return np.arange(start, end)
+
+    def add_faces(self, faces):
+        """
+        Append faces (sequences of vertex indices) and return their indices.
+        """
+        sizes = np.fromiter((len(f) for f in faces), dtype=np.int64, count=len(faces))
+        loops = np.fromiter((v for f in faces for v in f), dtype=np.int64,
+                            count=int(sizes.sum()))
+        return self.add_faces_flat(sizes, loops)
+
+    def add_faces_flat(self, sizes, loops):
+        """
+        Append faces given as CSR arrays (the size of each face and the
+        concatenated vertex indices) and return their indices.
+        """
+        sizes = np.asarray(sizes, dtype=np.int64)
+        loops = np.asarray(loops, dtype=np.int64)
+        first = self.num_faces
+        end = first + len(sizes)
+        self.face_start = _reserve(self.face_start, end)
+        self.face_size = _reserve(self.face_size, end)
+        self.face_alive = _reserve(self.face_alive, end)
+        self.loop_vert = _reserve(self.loop_vert, self.num_loops + len(loops))
+        starts = np.zeros(len(sizes), dtype=np.int64)
+        if (len(sizes) > 1):
+            np.cumsum(sizes[:-1], out=starts[1:])
+        self.face_start[first:end] = starts + self.num_loops
+        self.face_size[first:end] = sizes
+        self.face_alive[first:end] = True
+        self.loop_vert[self.num_loops:self.num_loops + len(loops)] = loops
+        self.num_loops += len(loops)
+        self.num_faces = end
+        if (self._vf_offsets is not None):
+            for f, v in zip(np.repeat(np.arange(first, end), sizes).tolist(), loops.tolist()):
+                self._vf_extra.setdefault(v, []).append(f)
+        self.topology_version += 1
+        return np.arange(first, end)
+
+    def remove_faces(self, faces):
+        """
+        Remove faces, keeping their vertices (like FACES_KEEP_BOUNDARY).
+        """
+        self.face_alive[np.asarray(faces, dtype=np.int64)] = False
+        self.topology_version += 1
+
+    def remove_edges(self, vertex_pairs):
+        """
+        Remove the faces using each edge (like the EDGES_FACES context).
+        """
+        faces = []
+        for a, b in vertex_pairs:
+            faces.extend(self.edge_faces(a, b))
+        self.remove_faces(faces)
+
+    def reverse_face(self, face):
+        """
+        Flip the winding of a face in place.
+        """
+        start = self.face_start[face]
+        end = start + self.face_size[face]
+        self.loop_vert[start:end] = self.loop_vert[start:end][::-1]
+        self.topology_version += 1
+
+    def merge_faces(self, faces):
+        """
+        Replace a connected group of faces by the single face bounding them.
+        Interior edges disappear along with any vertex they isolate.
+        Return the new face, or None if the group has no simple boundary.
+        """
+        loops = [self.face_verts(faces[0]).tolist()]
+        directed = set(zip(loops[0], loops[0][1:] + loops[0][:1]))
+        pending = [int(f) for f in faces[1:]]
+        while (pending):
+            for f in pending:
+                verts = self.face_verts(f).tolist()
+                edges = set(zip(verts, verts[1:] + verts[:1]))
+                if (edges & directed):
+                    verts.reverse()
+                    edges = set(zip(verts, verts[1:] + verts[:1]))
+                if (any((b, a) in directed for a, b in edges)):
+                    break
+            else:
+                return None
+            pending.remove(f)
+            loops.append(verts)
+            directed |= edges
+
+        boundary = {}
+        for a, b in directed:
+            if ((b, a) not in directed):
+                if (a in boundary):
+                    return None
+                boundary[a] = b
+        start = next(iter(boundary))
+        merged = [start]
+        while (boundary[merged[-1]] != start):
+            merged.append(boundary[merged[-1]])
+            if (len(merged) > len(boundary)):
+                return None
+        if (len(merged) != len(boundary)):
+            return None
+        self.remove_faces(faces)
+        return int(self.add_faces([merged])[0])
+
+    def dissolve_edges(self, vertex_pairs):
+        """
+        Join the two faces on either side of each edge into one face.
+        Vertices left with two edges are kept, as in bmesh dissolve_edges.
+        """
+        for a, b in vertex_pairs:
+            faces = self.edge_faces(a, b)
+            if (len(faces) == 2):
+                self.merge_faces(faces)
+
+    def dissolve_verts(self, verts):
+        """
+        Remove vertices, merging the faces around each one. A vertex with
+        only two edges is dropped from the faces using it instead.
+        """
+        for v in verts:
+            v = int(v)
+            faces = self.vert_faces(v)
+            if (len(self.vert_neighbors(v)) > 2 and len(faces) > 1):
+                merged = self.merge_faces(faces)
+                faces = [] if merged is None else [merged]
+            for f in faces:
+                verts_of_face = [int(u) for u in self.face_verts(f) if u != v]
+                if (len(verts_of_face) == self.face_size[f]):
+                    continue
+                self.remove_faces([f])
+                if (len(verts_of_face) >= 3):
+                    self.add_faces([verts_of_face])
+            if (not self.vert_faces(v)):
+                self.vert_alive[v] = False
+
+    def connect_verts(self, vert_a, vert_b):
+        """
+        Split the face containing both vertices along a new edge between
+        them. Nothing happens if they are already connected.
+        """
+        if (self.edge_faces(vert_a, vert_b)):
+            return None
+        for f in self.vert_faces(vert_a):
+            verts = self.face_verts(f).tolist()
+            if (vert_b not in verts):
+                continue
+            i, j = verts.index(vert_a), verts.index(vert_b)
+            if (i > j):
+                i, j = j, i
+            first = verts[i:j + 1]
+            second = verts[j:] + verts[:i + 1]
+            self.remove_faces([f])
+            return self.add_faces([first, second])
+        return None
+
+    def recalc_face_normals(self, faces):
+        """
+        Orient faces consistently with the live faces around them, and with
+        each other where they only touch one another.
+        """
+        pending = [int(f) for f in faces]
+        group = set(pending)
+        oriented = set()
+        while (pending):
+            seed = None
+            for f in pending:
+                neighbor = self._oriented_neighbor(f, group, oriented)
+                if (neighbor is not None):
+                    seed = f
+                    break
+            if (seed is None):
+                seed = pending[0]
+            else:
+                self._orient_against(seed, neighbor)
+            pending.remove(seed)
+            oriented.add(seed)
+
+    def _oriented_neighbor(self, face, group, oriented):
+        """
+        Return a shared edge (a, b) as ordered by a face outside the group,
+        or by an already oriented face of the group, or None.
+        """
+        verts = self.face_verts(face).tolist()
+        for a, b in zip(verts, verts[1:] + verts[:1]):
+            for other in self.edge_faces(a, b):
+                if (other == face or (other in group and other not in oriented)):
+                    continue
+                other_verts = self.face_verts(other).tolist()
+                i = other_verts.index(a)
+                if (other_verts[(i + 1) % len(other_verts)] == b):
+                    return (a, b)
+                return (b, a)
+        return None
+
+    def _orient_against(self, face, edge):
+        """
+        Reverse face if it runs along edge in the same direction as its neighbor.
+        """
+        verts = self.face_verts(face).tolist()
+        i = verts.index(edge[0])
+        if (verts[(i + 1) % len(verts)] == edge[1]):
+            self.reverse_face(face)
+
+    def edge_pairs(self, faces=None):
+        """
+        Return (tail, head) vertex arrays with one entry per loop of every
+        live face, or of the given faces, each loop running from its
+        vertex to the next one.
+        """
+        if (faces is None):
+            faces = self.live_faces()
+        sizes = self.face_size[faces]
+        starts = self.face_start[faces]
+        loops = _face_loop_indices(starts, sizes)
+        position = loops - np.repeat(starts, sizes)
+        next_loops = np.where(position + 1 == np.repeat(sizes, sizes),
+                              loops - position, loops + 1)
+        return self.loop_vert[loops], self.loop_vert[next_loops]
+
+    def half_edges(self):
+        """
+        Return (loop_face, loop_next, loop_twin) arrays over all loops.
+        loop_twin is the opposite loop on the neighboring face, or -1 on
+        boundaries and for loops of dead faces. Cached until the topology
+        changes.
+        """
+        cache = self._half_edge_cache
+        if (cache is not None and cache[0] == self.topology_version):
+            return cache[1], cache[2], cache[3]
+        num_faces = self.num_faces
+        sizes = self.face_size[:num_faces]
+        loops = _face_loop_indices(self.face_start[:num_faces], sizes)
+        loop_face = np.full(self.num_loops, -1, dtype=np.int64)
+        loop_face[loops] = np.repeat(np.arange(num_faces), sizes)
+        position = loops - np.repeat(self.face_start[:num_faces], sizes)
+        loop_next = np.full(self.num_loops, -1, dtype=np.int64)
+        wrap = position + 1 == np.repeat(sizes, sizes)
+        loop_next[loops] = np.where(wrap, loops - position, loops + 1)
+
+        live = loops[self.face_alive[loop_face[loops]]]
+        tail = self.loop_vert[live]
+        head = self.loop_vert[loop_next[live]]
+        num_verts = np.int64(self.num_verts)
+        keys = tail*num_verts + head
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+        reverse = head*num_verts + tail
+        found = np.searchsorted(sorted_keys, reverse)
+        found = np.minimum(found, len(sorted_keys) - 1)
+        loop_twin = np.full(self.num_loops, -1, dtype=np.int64)
+        if (len(live)):
+            match = sorted_keys[found] == reverse
+            loop_twin[live[match]] = live[order[found[match]]]
+        self._half_edge_cache = (self.topology_version, loop_face, loop_next, loop_twin,
+                                 sorted_keys, live[order])
+        return loop_face, loop_next, loop_twin
+
+    def find_loops(self, tails, heads):
+        """
+        Return the live loop running from each vertex in tails to the
+        matching vertex in heads, or -1 where no face has that edge in
+        that direction.
+        """
+        self.half_edges()
+        sorted_keys, sorted_loops = self._half_edge_cache[4], self._half_edge_cache[5]
+        keys = np.asarray(tails, dtype=np.int64)*np.int64(self.num_verts) + heads
+        result = np.full(len(keys), -1, dtype=np.int64)
+        if (len(sorted_keys) == 0):
+            return result
+        found = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+        match = sorted_keys[found] == keys
+        result[match] = sorted_loops[found[match]]
+        return result
+
+def _face_loop_indices(face_start, face_size):
+    """
+    Return the loop indices of the given faces, concatenated in order.
+    """
+    if (len(face_size) == 0):
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(face_start - np.cumsum(face_size) + face_size, face_size)
+    return offsets + np.arange(int(face_size.sum()))
+
+def furthest_along_normal(mesh, origin, axis, vertices):
+    """
+    Take in an origin vertex index, an axis (1 = +X, -2 = -Y, etc),
+    and a list of other vertex indices. Return the vertex that is the
+    greatest distance away along the axis, or -1 if none is ahead. Of
+    vertices equally far, the one with the lowest index is returned, like
+    _step_along does.
+    """
+    if (len(vertices) == 0):
+        return -1
+    vertices = np.asarray(vertices, dtype=np.int64)
+    component = abs(axis) - 1
+    dist = np.sign(axis)*(mesh.co[vertices, component] - mesh.co[origin, component])
+    furthest = dist.max()
+    if (furthest <= 0):
+        return -1
+    return int(vertices[dist == furthest].min())
+
+def _step_along(mesh, offsets, neighbors, verts, axis):
+    """
+    For every vertex in verts (-1 entries are skipped), return the neighbor
+    furthest along the axis, or -1 if no neighbor is ahead of it. Ties go
+    to the lowest vertex index, as in furthest_along_normal.
+    """
+    result = np.full(len(verts), -1, dtype=np.int64)
+    active = np.flatnonzero(verts >= 0)
+    if (len(active) == 0):
+        return result
+    current = verts[active]
+    start = offsets[current]
+    degree = offsets[current + 1] - start
+    width = int(degree.max()) if len(degree) else 0
+    if (width == 0):
+        return result
+    slot = np.arange(width)
+    valid = slot[None, :] < degree[:, None]
+    candidates = neighbors[np.where(valid, start[:, None] + slot[None, :], 0)]
+    component = abs(axis) - 1
+    dist = np.sign(axis)*(mesh.co[candidates, component] - mesh.co[current, component][:, None])
+    dist[~valid] = -np.inf
+    furthest = dist.max(axis=1)
+    best = np.where(dist == furthest[:, None], candidates, mesh.num_verts).min(axis=1)
+    ahead = furthest > 0
+    result[active[ahead]] = best[ahead]
+    return result
+
+def walk_grids(mesh, start_verts, num_rows, num_columns, directions):
+    """
+    Walk a grid from every start vertex at once. Each step gathers the
+    neighbor coordinates of all walks into one padded array and picks the
+    furthest neighbors in one array operation, breaking ties like
+    resolve_grid, so every walk ends on the grid resolve_grid finds.
+    Return a (starts, rows+1, columns+1) array of vertex indices and a mask
+    of the walks that completed.
+    """
+    offsets, neighbors = mesh.neighbor_csr()
+    starts = np.asarray(start_verts, dtype=np.int64).ravel()
+    grids = np.full((len(starts), num_rows + 1, num_columns + 1), -1, dtype=np.int64)
+    row_start = starts
+    for i in range(num_rows + 1):
+        if (i > 0):
+            row_start = _step_along(mesh, offsets, neighbors, row_start, directions[1])
+        current = row_start
+        grids[:, i, 0] = current
+        for j in range(num_columns):
+            current = _step_along(mesh, offsets, neighbors, current, directions[0])
+            grids[:, i, j + 1] = current
+    return grids, (grids >= 0).all(axis=(1, 2))
+
+def resolve_grid(mesh, start_vert, num_rows, num_columns, directions):
+    """
+    Walk a grid of (rows x columns) faces from start_vert, going in the
+    across and down directions. Return a (rows+1, columns+1) array of
+    vertex indices, or None if the grid cannot be walked.
+    """
+    rows = np.empty((num_rows + 1, num_columns + 1), dtype=np.int64)
+    row_start = start_vert
+    for i in range(num_rows + 1):
+        if (i > 0):
+            row_start = furthest_along_normal(mesh, row_start, directions[1],
+                                              mesh.vert_neighbors(row_start))
+            if (row_start < 0):
+                return None
+        current = row_start
+        rows[i, 0] = current
+        for j in range(num_columns):
+            current = furthest_along_normal(mesh, current, directions[0],
+                                            mesh.vert_neighbors(current))
+            if (current < 0):
+                return None
+            rows[i, j + 1] = current
+    return rows
+
+def _quad_walk_tables(mesh, forward):
+    """
+    Return (vert, step, back, across, down) loop tables for walking quads,
+    cached until the topology changes. Forward means across follows
+    loop_next. For the loop at the top-left corner of a quad, across and
+    down give the top-left loop of the quad to its right and below. Every
+    table has a sentinel entry at index num_loops that maps to itself and
+    stands for boundaries and faces that are not quads.
+    """
+    cache = mesh._walk_cache.get(forward)
+    if (cache is not None and cache[0] == mesh.topology_version):
+        return cache[1]
+    loop_face, loop_next, loop_twin = mesh.half_edges()
+    num_loops = len(loop_next)
+    sentinel = num_loops
+    next_ = np.append(loop_next, sentinel)
+    next_[next_ < 0] = sentinel
+    prev = np.full(num_loops + 1, sentinel, dtype=np.int64)
+    linked = np.flatnonzero(loop_next >= 0)
+    prev[loop_next[linked]] = linked
+    twin = np.append(loop_twin, sentinel)
+    twin[twin < 0] = sentinel
+    quad = np.append(loop_face >= 0, False)
+    quad[:-1] &= mesh.face_size[np.maximum(loop_face, 0)] == 4
+    quad[sentinel] = True
+    if (forward):
+        step, back = next_, prev
+        across = next_[twin[next_]]
+        down = twin[next_[next_]]
+    else:
+        step, back = prev, next_
+        across = twin[prev[prev]]
+        down = next_[twin[next_]]
+    across[~quad[across]] = sentinel
+    down[~quad[down]] = sentinel
+    vert = np.append(mesh.loop_vert[:num_loops], -1)
+    tables = (vert, step, back, across, down, quad)
+    mesh._walk_cache[forward] = (mesh.topology_version, tables)
+    return tables
+
+def walk_grids_topology(mesh, start_verts, across_verts, num_rows, num_columns, flip=False):
+    """
+    Walk a grid of quads from every start vertex at once by hopping across
+    face loops, without comparing coordinates. The first row runs from
+    each start vertex towards its across vertex, and rows follow on the
+    side of the face whose loop runs from the across vertex to the start
+    vertex, or on the other side if flip is set. Twin loops run in
+    opposite directions, so the winding found for the first face holds
+    for the whole walk.
+    Return a (starts, rows+1, columns+1) array of vertex indices and a mask
+    of the walks that completed.
+    """
+    starts = np.asarray(start_verts, dtype=np.int64).ravel()
+    across = np.asarray(across_verts, dtype=np.int64).ravel()
+    if (flip):
+        loops = mesh.find_loops(starts, across)
+    else:
+        loops = mesh.find_loops(across, starts)
+    grids, valid = _walk_loops(mesh, loops, num_rows, num_columns, flip, not flip)
+    grids[~valid] = -1
+    return grids, valid
+
+def _walk_loops(mesh, loops, num_rows, num_columns, forward, advance):
+    """
+    Walk grids of quads from an array of loops (-1 for none), each being
+    the top-left corner of the first face, or the loop just before it when
+    advance is set. Return the (loops, rows+1, columns+1) vertex grids,
+    only meaningful where the returned mask is set.
+    """
+    vert, step, back, across_table, down_table, quad = _quad_walk_tables(mesh, forward)
+    sentinel = len(vert) - 1
+    loop = np.where(loops < 0, sentinel, loops)
+    if (advance):
+        loop = back[loop]
+    loop[~quad[loop]] = sentinel
+
+    # Top-left loop of every face of the grid, one contiguous array per face
+    cells = np.empty((num_rows, num_columns, len(loop)), dtype=np.int64)
+    row_loop = loop
+    for i in range(num_rows):
+        if (i > 0):
+            row_loop = down_table[row_loop]
+        cells[i, 0] = row_loop
+        for j in range(1, num_columns):
+            cells[i, j] = across_table[cells[i, j - 1]]
+    valid = (cells != sentinel).all(axis=(0, 1))
+    grids = np.empty((num_rows + 1, num_columns + 1, len(loop)), dtype=np.int64)
+    grids[:-1, :-1] = vert[cells]
+    grids[:-1, -1] = vert[step[cells[:, -1]]]
+    grids[-1, :-1] = vert[back[cells[-1]]]
+    grids[-1, -1] = vert[step[step[cells[-1, -1]]]]
+    return grids.transpose(2, 0, 1), valid
+
+def resolve_grid_topology(mesh, start_vert, across_vert, num_rows, num_columns, flip=False):
+    """
+    Walk a grid of quads from start_vert through face loops, with the
+    first row running towards across_vert. Return a (rows+1, columns+1)
+    array of vertex indices, or None if the grid cannot be walked.
+    """
+    grids, valid = walk_grids_topology(mesh, [start_vert], [across_vert],
+                                       num_rows, num_columns, flip)
+    return grids[0] if valid[0] else None
+
+def _regular_grids(mesh, grids):
+    """
+    Return a mask of the grids whose vertices are all distinct and whose
+    inner vertices have exactly four neighbors.
+    """
+    regular = np.ones(len(grids), dtype=bool)
+    inner = grids[:, 1:-1, 1:-1].reshape(len(grids), -1)
+    if (inner.shape[1]):
+        offsets, _ = mesh.neighbor_csr()
+        degree = offsets[1:] - offsets[:-1]
+        for k in range(inner.shape[1]):
+            regular &= degree[inner[:, k]] == 4
+    flat = np.sort(grids[regular].reshape(int(regular.sum()), -1).astype(np.int32), axis=1)
+    regular[regular] = (flat[:, 1:] != flat[:, :-1]).all(axis=1)
+    return regular
+
+def _candidate_sites(mesh, type, chunk_size):
+    """
+    Walk the grid of type from both ends of every quad loop, one chunk of
+    loops at a time, and return the (anchors, across, flip) arrays of the
+    walks that form a regular grid.
+    """
+    loop_face, loop_next, loop_twin = mesh.half_edges()
+    live = np.flatnonzero(loop_face >= 0)
+    live = live[mesh.face_alive[loop_face[live]] & (mesh.face_size[loop_face[live]] == 4)]
+    tails = mesh.loop_vert[live]
+    heads = mesh.loop_vert[loop_next[live]]
+    grid_info = type_definitions[type]
+    found = ([], [], [])
+    for flip in (False, True):
+        anchors, across = (tails, heads) if flip else (heads, tails)
+        for start in range(0, len(live), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            grids, valid = _walk_loops(mesh, live[chunk], grid_info[0], grid_info[1],
+                                       flip, not flip)
+            valid[valid] = _regular_grids(mesh, grids[valid])
+            found[0].append(anchors[chunk][valid])
+            found[1].append(across[chunk][valid])
+            found[2].append(np.full(int(valid.sum()), flip))
+    empty = np.zeros(0, dtype=np.int64)
+    return (np.concatenate(found[0]) if found[0] else empty,
+            np.concatenate(found[1]) if found[1] else empty,
+            np.concatenate(found[2]) if found[2] else empty.astype(bool))
+
+def site_grids(mesh, type, sites):
+    """
+    Return the (sites, rows+1, columns+1) vertex grids of sites given as
+    (anchors, across, flip) arrays.
+    """
+    anchors, across, flip = sites
+    grid_info = type_definitions[type]
+    grids = np.full((len(anchors), grid_info[0] + 1, grid_info[1] + 1), -1, dtype=np.int64)
+    for side in (False, True):
+        mask = flip == side
+        if (mask.any()):
+            grids[mask] = walk_grids_topology(mesh, anchors[mask], across[mask],
+                                              grid_info[0], grid_info[1], side)[0]
+    return grids
+
+def site_density_ratio(mesh, grids):
+    """
+    Return, for every grid, the mean across edge length of its last row
+    divided by that of its first row. Values above 1 mean the faces grow
+    in the down direction of the grid.
+    """
+    co = mesh.co
+    top = np.linalg.norm(co[grids[:, 0, 1:]] - co[grids[:, 0, :-1]], axis=2).mean(axis=1)
+    bottom = np.linalg.norm(co[grids[:, -1, 1:]] - co[grids[:, -1, :-1]], axis=2).mean(axis=1)
+    return bottom / np.maximum(top, 1e-12)
+
+def find_sites(mesh, type, min_density_ratio=None, chunk_size=1 << 20):
+    """
+    Return every place where the grid of type fits a regular patch of
+    quads as (anchors, across, flip) arrays, usable with
+    walk_grids_topology. Each quad loop is tried from both of its ends.
+    The sites are cached until the topology changes. With
+    min_density_ratio, only sites whose faces grow at least that much
+    from the first to the last row are returned.
+    """
+    cache = mesh._site_cache.get(type)
+    if (cache is None or cache[0] != mesh.topology_version):
+        cache = (mesh.topology_version, _candidate_sites(mesh, type, chunk_size))
+        mesh._site_cache[type] = cache
+    sites = cache[1]
+    if (min_density_ratio is None):
+        return sites
+    keep = site_density_ratio(mesh, site_grids(mesh, type, sites)) >= min_density_ratio
+    return tuple(array[keep] for array in sites)
+
+class _Phase:
+    """
+    Context manager adding its elapsed time to a Stats phase.
+    """
+    __slots__ = ("stats", "name", "start")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        timings = self.stats.timings
+        timings[self.name] = timings.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+class Stats:
+    """
+    Per-phase wall times (in seconds) and geometry counters for one
+    operation. Phases entered several times accumulate.
+    """
+    __slots__ = ("operation", "timings", "counters")
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.timings = {}
+        self.counters = {}
+
+    def __bool__(self):
+        return True
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def total(self):
+        return sum(self.timings.values())
+
+    def as_dict(self):
+        return {"operation" : self.operation,
+                "timings" : dict(self.timings),
+                "counters" : dict(self.counters)}
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+class _NullStats:
+    """
+    Stand-in for Stats while instrumentation is disabled. Every method is
+    a no-op and phase() returns a shared context manager, so disabled
+    instrumentation allocates and records nothing.
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def count(self, name, amount=1):
+        pass
+
+NULL_STATS = _NullStats()
+
+class Instrumentation:
+    """
+    Switch for operation statistics. begin() returns a Stats while enabled
+    and NULL_STATS otherwise; end() keeps the result as last and, when
+    log_path is set, appends it as a JSON line to that file.
+    """
+    __slots__ = ("enabled", "log_path", "last")
+
+    def __init__(self):
+        self.enabled = False
+        self.log_path = ""
+        self.last = None
+
+    def begin(self, operation):
+        if (not self.enabled):
+            return NULL_STATS
+        return Stats(operation)
+
+    def end(self, stats):
+        if (not stats):
+            return
+        self.last = stats
+        if (self.log_path):
+            record = stats.as_dict()
+            record["time"] = time.time()
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+instrumentation = Instrumentation()
+
+def _apply_steps(mesh, pattern, grid, dissolve, stats):
+    """
+    Run the topology steps of a pattern on one flat grid of vertex indices.
+    """
+    for op, args in pattern.steps:
+        if (op == "dissolve_edges"):
+            mesh.dissolve_edges([(grid[a], grid[b]) for a, b in args])
+            stats.count("edges_dissolved", len(args))
+        elif (op == "dissolve_verts"):
+            mesh.dissolve_verts(grid[args])
+            stats.count("verts_dissolved", len(args))
+        elif (op == "connect_verts"):
+            for a, b in args:
+                mesh.connect_verts(grid[a], grid[b])
+            stats.count("edges_connected", len(args))
+        elif (op == "delete"):
+            if (dissolve and args["edges"]):
+                mesh.remove_edges([(grid[a], grid[b]) for a, b in args["edges"]])
+                stats.count("edges_deleted", len(args["edges"]))
+            to_delete = []
+            for group in args["faces"]:
+                to_delete += mesh.faces_within(grid[group])
+            mesh.remove_faces(to_delete)
+            stats.count("faces_deleted", len(to_delete))
+
+def apply_wave(mesh, pattern, grids, dissolve, stats=NULL_STATS, project=None):
+    """
+    Apply a compiled pattern to a wave of grids sharing no faces. The
+    positions, projection, new vertices and face templates of the whole
+    wave each come from one array operation, and only the topology steps
+    run grid by grid. project is as for apply_pattern. Grids are not
+    checked for overlap; callers pick a disjoint set first, as
+    _apply_disjoint does.
+    """
+    grids = np.asarray(grids, dtype=np.int64).reshape(len(grids), -1)
+    count = len(grids)
+    points = pattern.points(mesh.co[grids])
+    if (project is not None):
+        with stats.phase("project"):
+            placed = pattern.placed_points()
+            points[:, placed] = project(points[:, placed].reshape(-1, 3)).reshape(count, -1, 3)
+    with stats.phase("delete"):
+        for grid in grids:
+            _apply_steps(mesh, pattern, grid, dissolve, stats)
+    with stats.phase("verts"):
+        mesh.co[grids[:, pattern.move_cells]] = points[:, pattern.move_points]
+        new_verts = mesh.add_verts(points[:, pattern.new_points].reshape(-1, 3))
+        verts = np.concatenate([grids, new_verts.reshape(count, -1)], axis=1)
+    stats.count("verts_moved", count * len(pattern.move_cells))
+    stats.count("verts_created", len(new_verts))
+    if (len(pattern.face_sizes)):
+        with stats.phase("faces"):
+            created = mesh.add_faces_flat(np.tile(pattern.face_sizes, count),
+                                          verts[:, pattern.face_loops].ravel())
+        stats.count("faces_created", len(created))
+        with stats.phase("normals"):
+            for faces in created.reshape(count, -1):
+                mesh.recalc_face_normals(faces)
+    if (dissolve and len(pattern.dissolve_cells)):
+        with stats.phase("dissolve"):
+            mesh.dissolve_verts(grids[:, pattern.dissolve_cells].ravel())
+        stats.count("verts_dissolved", count * len(pattern.dissolve_cells))
+
+def apply_pattern(mesh, pattern, rows, dissolve, stats=NULL_STATS, project=None):
+    """
+    Apply a compiled pattern to a grid of vertex indices, recording phase
+    timings and counters in stats. project, if given, takes an (n, 3)
+    array of moved and new vertex positions and returns them placed on
+    the target surface.
+    """
+    apply_wave(mesh, pattern, [np.ravel(rows)], dissolve, stats, project)
+
+def grid_mesh(grid_co, num_rows, num_columns):
+    """
+    Return a PolyMesh of the quads of a grid of (num_rows x num_columns)
+    vertices, numbered row-major like the cells of a pattern.
+    """
+    cells = np.arange(num_rows*num_columns).reshape(num_rows, num_columns)
+    quads = np.stack([cells[:-1, :-1], cells[:-1, 1:], cells[1:, 1:], cells[1:, :-1]], axis=-1)
+    num_faces = (num_rows - 1)*(num_columns - 1)
+    return PolyMesh(grid_co, np.arange(num_faces)*4, np.full(num_faces, 4), quads.ravel())
+
+def preview_pattern(pattern, grid_co, dissolve=False):
+    """
+    Take in the (cells x 3) coordinates of a grid and return what the
+    pattern would turn it into, without touching any mesh: the positions
+    of the remaining and new vertices, and the face sizes and loops
+    indexing them. Faces outside the grid are not included.
+    """
+    mesh = grid_mesh(grid_co, pattern.num_rows, pattern.num_columns)
+    apply_pattern(mesh, pattern, np.arange(pattern.num_rows*pattern.num_columns), dissolve)
+    mesh = mesh.compacted()
+    return (mesh.co[:mesh.num_verts], mesh.face_size[:mesh.num_faces],
+            mesh.loop_vert[:mesh.num_loops])
+
+def select_disjoint(footprints):
+    """
+    Take in a list of element sets, one per patch. Greedily keep patches
+    whose elements do not overlap an earlier kept patch and return the
+    indices of the kept ones.
+    """
+    used = set()
+    kept = []
+    for i, footprint in enumerate(footprints):
+        if (used.isdisjoint(footprint)):
+            used.update(footprint)
+            kept.append(i)
+    return kept
+
+def patch_footprint(mesh, rows):
+    """
+    Return the faces touching any vertex of a grid.
+    """
+    return {f for v in rows.ravel() for f in mesh.vert_faces(v)}
+
+def reduce_many(mesh, start_verts, type, directions, dissolve, across_verts=None, flip=False,
+                project=None):
+    """
+    Resolve a grid from every start vertex up front, drop anchors without a
+    grid or overlapping an earlier patch, then apply the reduction to the
+    rest. Grids follow the axes in directions, or the face loops towards
+    across_verts when directions is None. Return the number of reductions
+    applied.
+    """
+    stats = instrumentation.begin(type)
+    grid_info = type_definitions[type]
+    with stats.phase("grid"):
+        if (directions is None):
+            grids, valid = walk_grids_topology(mesh, start_verts, across_verts,
+                                               grid_info[0], grid_info[1], flip)
+        else:
+            grids, valid = walk_grids(mesh, start_verts, grid_info[0], grid_info[1], directions)
+    stats.count("skipped", int((~valid).sum()))
+    applied = _apply_disjoint(mesh, type, grids[valid], dissolve, stats, project)
+    instrumentation.end(stats)
+    return applied
+
+def reduce_sites(mesh, type, sites, dissolve, project=None):
+    """
+    Apply the reduction at the sites returned by find_sites, skipping
+    sites that overlap an earlier one, in a single wave. Return the
+    number applied.
+    """
+    stats = instrumentation.begin(type)
+    with stats.phase("grid"):
+        grids = site_grids(mesh, type, sites)
+    applied = _apply_disjoint(mesh, type, grids, dissolve, stats, project)
+    instrumentation.end(stats)
+    return applied
+
+def grid_footprints(mesh, grids):
+    """
+    Return (offsets, faces) CSR arrays listing the faces touching each
+    grid. The faces of every grid are gathered at once from a
+    vertex-to-face index of the live faces, so building the overlap
+    graph of a large batch does not walk the faces of each vertex in
+    Python. A face is listed once for every grid vertex it touches.
+    """
+    grids = np.asarray(grids, dtype=np.int64).reshape(len(grids), -1)
+    faces = mesh.live_faces()
+    sizes = mesh.face_size[faces]
+    loop_face = np.repeat(faces, sizes)
+    loop_vert = mesh.loop_vert[_face_loop_indices(mesh.face_start[faces], sizes)]
+    vert_offsets = np.zeros(mesh.num_verts + 1, dtype=np.int64)
+    np.cumsum(np.bincount(loop_vert, minlength=mesh.num_verts), out=vert_offsets[1:])
+    vert_faces = loop_face[np.argsort(loop_vert, kind="stable")]
+    verts = grids.ravel()
+    counts = vert_offsets[verts + 1] - vert_offsets[verts]
+    firsts = np.cumsum(counts) - counts
+    gathered = vert_faces[np.repeat(vert_offsets[verts] - firsts, counts)
+                          + np.arange(counts.sum())]
+    offsets = np.zeros(len(grids) + 1, dtype=np.int64)
+    np.cumsum(counts.reshape(len(grids), -1).sum(axis=1), out=offsets[1:])
+    return offsets, gathered
+
+def select_disjoint_csr(offsets, elements, num_elements):
+    """
+    Like select_disjoint, for footprints given as (offsets, elements) CSR
+    arrays over num_elements elements.
+    """
+    used = np.zeros(num_elements, dtype=bool)
+    bounds = offsets.tolist()
+    kept = []
+    for i in range(len(bounds) - 1):
+        footprint = elements[bounds[i]:bounds[i + 1]]
+        if (not used[footprint].any()):
+            used[footprint] = True
+            kept.append(i)
+    return kept
+
+def _apply_disjoint(mesh, type, grids, dissolve, stats, project=None):
+    """
+    Apply the reduction to the disjoint subset of grids, every grid that
+    does not overlap an earlier one, and return how many were applied.
+    The kept grids share no faces, so they are applied as a single wave.
+    Overlapping grids are skipped and counted, not deferred to a later
+    wave: they were walked on faces the first wave replaces.
+    """
+    kept = []
+    if (len(grids)):
+        with stats.phase("grid"):
+            offsets, faces = grid_footprints(mesh, grids)
+            kept = select_disjoint_csr(offsets, faces, mesh.num_faces)
+    if (kept):
+        apply_wave(mesh, patterns[type], np.asarray(grids)[kept], dissolve, stats, project)
+    stats.count("patches", len(kept))
+    stats.count("skipped", len(grids) - len(kept))
+    return len(kept)
+
+def reduce(mesh, start_vert, type, directions, dissolve, across_vert=None, flip=False,
+           project=None):
+    """
+    Resolve the grid of the given reduction type from start_vert and apply
+    it. When directions is None the grid is walked through face loops
+    towards across_vert. Return False, leaving the mesh untouched, if no
+    grid is found.
+    """
+    stats = instrumentation.begin(type)
+    try:
+        grid_info = type_definitions[type]
+        with stats.phase("grid"):
+            if (directions is None):
+                rows = resolve_grid_topology(mesh, start_vert, across_vert,
+                                             grid_info[0], grid_info[1], flip)
+            else:
+                rows = resolve_grid(mesh, start_vert, grid_info[0], grid_info[1], directions)
+        if (rows is None):
+            stats.count("skipped")
+            return False
+        apply_pattern(mesh, patterns[type], rows, dissolve, stats, project)
+        return True
+    finally:
+        instrumentation.end(stats)
+
+def _mix(values):
+    """
+    Scramble an array of uint64 values, wrapping on overflow.
+    """
+    values = values ^ (values >> np.uint64(33))
+    values *= np.uint64(0xFF51AFD7ED558CCD)
+    values ^= values >> np.uint64(29)
+    return values
+
+def _fingerprint(mesh, faces, verts, edge_a, edge_b, valence, boundary_verts, rounds=2):
+    """
+    Return a hash of the topology of a region that does not depend on
+    vertex or face indices. Vertex labels start from valence and
+    boundary, are refined from the labels of their neighbors for a few
+    rounds, and are folded into a label per face from its directed edges,
+    so the winding of each face, and whether it runs against its
+    neighbors, changes the hash.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if (len(faces) == 0):
+        return digest.hexdigest()
+    labels = _mix(valence.astype(np.uint64)*np.uint64(2) + boundary_verts)
+    source = np.concatenate([edge_a, edge_b])
+    target = np.concatenate([edge_b, edge_a])
+    order = np.argsort(source, kind="stable")
+    source, target = source[order], target[order]
+    firsts = np.flatnonzero(np.concatenate([[True], source[1:] != source[:-1]]))
+    owners = source[firsts]
+    for _ in range(rounds):
+        sums = np.add.reduceat(_mix(labels[target]), firsts)
+        labels[owners] = _mix(labels[owners] ^ sums)
+    sizes = mesh.face_size[faces]
+    starts = np.cumsum(sizes) - sizes
+    heads = mesh.loop_vert[_face_loop_indices(mesh.face_start[faces], sizes)]
+    following = np.arange(1, len(heads) + 1)
+    following[starts + sizes - 1] = starts
+    tails = heads[following]
+    # A loop running the same way as another along its edge belongs to a flipped face
+    keys = heads*mesh.num_verts + tails
+    sorted_keys = np.sort(keys)
+    same_way = np.isin(keys, sorted_keys[1:][sorted_keys[1:] == sorted_keys[:-1]])
+    loop_labels = _mix(labels[heads] ^ _mix(labels[tails] + np.uint64(1) +
+                                            same_way.astype(np.uint64)))
+    face_labels = _mix(np.add.reduceat(loop_labels, starts) ^ sizes.astype(np.uint64))
+    digest.update(np.sort(face_labels).astype("<u8").tobytes())
+    digest.update(np.sort(labels[verts]).astype("<u8").tobytes())
+    return digest.hexdigest()
+
+def audit(mesh, faces=None):
+    """
+    Check the topology of the given faces, or of the whole mesh, and
+    return a report dict. Edges are counted as boundary (one face),
+    flipped (two faces winding the same way) or non-manifold (more than
+    two faces), using the faces outside the region too. Poles are inner
+    vertices of the region without four edges, and loose vertices are
+    only counted when the whole mesh is audited. The fingerprint hashes
+    the topology of the region and does not change with vertex or face
+    order, so runs and versions can be compared. Everything is computed with array
+    operations over the faces around the region.
+    """
+    whole = faces is None
+    num_verts = mesh.num_verts
+    if (whole):
+        faces = mesh.live_faces()
+    else:
+        faces = np.unique(np.asarray(faces, dtype=np.int64))
+        faces = faces[faces < mesh.num_faces]
+        faces = faces[mesh.face_alive[faces]]
+    sizes = mesh.face_size[faces]
+    loop_verts = mesh.loop_vert[_face_loop_indices(mesh.face_start[faces], sizes)]
+    region_verts = np.zeros(num_verts, dtype=bool)
+    region_verts[loop_verts] = True
+    verts = np.flatnonzero(region_verts)
+    if (whole):
+        around = faces
+        used = region_verts
+    else:
+        # Every face sharing an edge with the region touches one of its vertices
+        around = np.unique([f for v in verts.tolist() for f in mesh.vert_faces(v)]
+                           ).astype(np.int64)
+        used = np.ones(num_verts, dtype=bool)
+
+    tail, head = mesh.edge_pairs(around)
+    in_region = np.zeros(mesh.num_faces, dtype=bool)
+    in_region[faces] = True
+    loop_in_region = in_region[np.repeat(around, mesh.face_size[around])]
+    num = np.int64(num_verts)
+    keys = (np.minimum(tail, head)*num + np.maximum(tail, head))*2 + (tail > head)
+    order = np.argsort(keys)
+    keys, loop_in_region = keys[order], loop_in_region[order]
+    edge_keys = keys >> 1
+    firsts = np.flatnonzero(np.concatenate([[True], edge_keys[1:] != edge_keys[:-1]]))
+    if (len(keys) == 0):
+        firsts = firsts[:0]
+    uses = np.diff(np.append(firsts, len(keys)))
+    backward = np.add.reduceat(keys & 1, firsts) if len(firsts) else uses
+    region_edge = np.logical_or.reduceat(loop_in_region, firsts) if len(firsts) else uses > 0
+    edge_a, edge_b = edge_keys[firsts] // num, edge_keys[firsts] % num
+    boundary = uses == 1
+    flipped = (uses == 2) & (backward != 1)
+    non_manifold = uses > 2
+
+    valence = np.bincount(edge_a, minlength=num_verts) + np.bincount(edge_b,
+                                                                      minlength=num_verts)
+    boundary_verts = np.zeros(num_verts, dtype=np.uint64)
+    boundary_verts[edge_a[boundary]] = 1
+    boundary_verts[edge_b[boundary]] = 1
+    inner = verts[boundary_verts[verts] == 0]
+
+    face_sizes, face_counts = np.unique(sizes, return_counts=True)
+    valences, valence_counts = np.unique(valence[verts], return_counts=True)
+    return {"faces" : len(faces),
+            "verts" : len(verts),
+            "edges" : int(region_edge.sum()),
+            "face_sizes" : {str(n): int(c) for n, c in zip(face_sizes, face_counts)},
+            "triangles" : int((sizes == 3).sum()),
+            "ngons" : int((sizes > 4).sum()),
+            "valence" : {str(n): int(c) for n, c in zip(valences, valence_counts)},
+            "poles" : int((valence[inner] != 4).sum()),
+            "boundary_edges" : int((boundary & region_edge).sum()),
+            "flipped_edges" : int((flipped & region_edge).sum()),
+            "non_manifold_edges" : int((non_manifold & region_edge).sum()),
+            "loose_verts" : int((mesh.vert_alive[:num_verts] & ~used).sum()),
+            "fingerprint" : _fingerprint(mesh, faces, verts, edge_a[region_edge],
+                                         edge_b[region_edge], valence, boundary_verts)}
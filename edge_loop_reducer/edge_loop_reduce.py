@@ -0,0 +1,2312 @@
+import bpy
+from bpy.app.handlers import persistent
+from bpy.types import (Panel,Operator)
+from bpy.utils import register_class, unregister_class
+import bmesh
+import gpu
+import hashlib
+import json
+import time
+import numpy as np
+from mathutils import Vector
+from mathutils.bvhtree import BVHTree
+from mathutils.kdtree import KDTree
+from gpu_extras.batch import batch_for_shader
+from .edge_loop_core import (type_definitions, patterns, select_disjoint,
+                             instrumentation, NULL_STATS, PolyMesh, reduce_many,
+                             find_sites, has_pattern, audit, preview_pattern)
+
+# Grid patches keyed on (object, active vertex, type, directions, generation)
+_patch_cache = {}
+_PATCH_CACHE_SIZE = 64
+
+# Dry-run results of reductions, keyed like _patch_cache and dissolve
+_preview_cache = {}
+_PREVIEW_CACHE_SIZE = 1024
+
+# Per-mesh counter bumped whenever the depsgraph reports a geometry update
+_geometry_generation = {}
+
+# Array copy of each analysed mesh, keyed on the object, with its generation
+_site_meshes = {}
+
+# BVH of the surface of each mesh as it was at the first projected
+# operation of the current edit session, keyed on the mesh
+_surface_cache = {}
+
+# Integer vertex layer holding the persistent ID of every vertex
+ID_LAYER = "elr_id"
+# Mesh property holding the next free vertex ID
+ID_NEXT_PROPERTY = "elr_next_id"
+# (bmesh, ElementIds) of each mesh, keyed on the mesh, dropped on any
+# geometry update not made by the add-on itself
+_id_cache = {}
+
+# PatchDeltas of the last operations of the current edit session, one
+# list per operation, keyed on the mesh
+_delta_journal = {}
+_REVERT_DEPTH = 32
+
+# Viewport draw handler of the reduction preview, which needs the gpu.state
+# module of Blender 3.0 and later
+_preview_handle = {"handle" : None}
+_PREVIEW_SUPPORTED = hasattr(gpu, "state")
+_PREVIEW_COLOR = (1.0, 0.55, 0.1, 1.0)
+
+# Mesh attributes the object-mode path keeps
+_KEPT_ATTRIBUTES = {"position", "sharp_face", ID_LAYER}
+
+# Object property holding the journal of recorded operations as JSON
+JOURNAL_PROPERTY = "elr_journal"
+
+# (bmesh, MirrorLookup) of each mesh, keyed on the mesh, dropped on any
+# geometry update not made by the add-on itself
+_mirror_cache = {}
+
+# Meshes whose next geometry update comes from an operation of the add-on,
+# which keeps the cached lookups up to date itself
+_own_updates = set()
+# Largest distance between a mirrored position and its counterpart vertex
+_MIRROR_TOLERANCE = 1e-4
+
+# Report of the last topology audit, shown in the panel
+_last_audit = {"report" : None}
+
+# Progress of the chunked batch runner, shown in the panel while it runs
+_batch_progress = {"running" : False, "done" : 0, "total" : 0}
+# Time spent applying patches between two redraws of the chunked runner
+_CHUNK_SECONDS = 0.05
+
+def geometry_generation(me):
+    """
+    Return the number of geometry updates seen for a mesh datablock.
+    """
+    return _geometry_generation.get(me.as_pointer(), 0)
+
+@persistent
+def _on_depsgraph_update(scene, depsgraph):
+    """
+    Bump the generation of every mesh whose geometry changed, so cached
+    grid validations for it are no longer matched.
+    """
+    # An object and its mesh are both reported for the same change
+    meshes = {}
+    for update in depsgraph.updates:
+        if (not update.is_updated_geometry):
+            continue
+        id_data = update.id.original
+        if (isinstance(id_data, bpy.types.Object)):
+            if (id_data.type != 'MESH'):
+                continue
+            id_data = id_data.data
+        elif (not isinstance(id_data, bpy.types.Mesh)):
+            continue
+        meshes[id_data.as_pointer()] = id_data
+    for ptr, me in meshes.items():
+        _geometry_generation[ptr] = _geometry_generation.get(ptr, 0) + 1
+        # Undo, manual edits and other operators leave the lookups stale
+        if (ptr not in _own_updates or not me.is_editmode):
+            _mirror_cache.pop(ptr, None)
+            _id_cache.pop(ptr, None)
+        _own_updates.discard(ptr)
+        if (not me.is_editmode):
+            _surface_cache.pop(ptr, None)
+            _delta_journal.pop(ptr, None)
+        
+def furthest_along_normal(origin, axis, vertices):
+    """
+    Take in an origin vertex, an axis (x+, x-, etc),
+    and a list of other vertices. Return the vertex
+    that is the greatest distance away along the axis.
+    """
+    if (not vertices):
+        return None
+    component = abs(axis)-1
+    dist = np.sign(axis)*(np.array([v.co[component] for v in vertices]) - origin.co[component])
+    best = int(np.argmax(dist))
+    if (dist[best] <= 0):
+        return None
+    return vertices[best]
+
+def active_vert(bm):
+    """
+    Return the active vertex from the selection history,
+    or None if the active element is not a selected vertex.
+    """
+    active = bm.select_history.active
+    if (isinstance(active, bmesh.types.BMVert) and active.select):
+        return active
+    return None
+
+class GridPatch:
+    """
+    A resolved grid of vertices. The vertices are stored row-major in a
+    flat list, with the row and column of each vertex in parallel arrays.
+    patch[r][c] returns the vertex at row r and column c.
+    """
+    __slots__ = ("verts", "rows", "columns", "num_rows", "num_columns")
+    
+    def __init__(self, verts, num_rows, num_columns):
+        self.verts = verts
+        self.num_rows = num_rows
+        self.num_columns = num_columns
+        self.rows = np.repeat(np.arange(num_rows), num_columns)
+        self.columns = np.tile(np.arange(num_columns), num_rows)
+        
+    def __len__(self):
+        return self.num_rows
+    
+    def __getitem__(self, row):
+        start = row*self.num_columns
+        return self.verts[start:start + self.num_columns]
+    
+    def is_valid(self):
+        """
+        Return False if any of the vertices has since been removed.
+        """
+        return all(v.is_valid for v in self.verts)
+
+def across_vertex(bm, start_vert):
+    """
+    Return the vertex giving the across direction for start_vert: the
+    latest selected vertex or edge of the selection history that shares
+    an edge with it, or None.
+    """
+    for elem in reversed(list(bm.select_history)):
+        if (not elem.select):
+            continue
+        if (isinstance(elem, bmesh.types.BMVert)):
+            if (elem != start_vert and edge_between(start_vert, elem) is not None):
+                return elem
+        elif (isinstance(elem, bmesh.types.BMEdge) and start_vert in elem.verts):
+            return elem.other_vert(start_vert)
+    return None
+
+def _loop_at(loop, vert):
+    """
+    Return the loop of loop.face at vert, where vert is an end of loop.edge.
+    """
+    return loop if loop.vert == vert else loop.link_loop_next
+
+def _step(loop, forward):
+    return loop.link_loop_next if forward else loop.link_loop_prev
+
+def resolve_grid_loops(num_rows, num_columns, start_vert, across_vert, flip=False):
+    """
+    Walk a grid of (rows x columns) quads by hopping across face loops,
+    without comparing coordinates. The first row runs from start_vert
+    towards across_vert. Rows follow on the side of the face whose loop
+    runs from across_vert to start_vert, or on the other side if flip is
+    set. Return a GridPatch, or None if the grid cannot be walked.
+    """
+    edge = edge_between(start_vert, across_vert)
+    if (edge is None):
+        return None
+    tail = start_vert if flip else across_vert
+    loop = next((l for l in edge.link_loops if l.vert == tail), None)
+    if (loop is None):
+        return None
+    loop = _loop_at(loop, start_vert)
+    forward = loop.link_loop_next.vert == across_vert
+    rows = [[] for _ in range(num_rows+1)]
+    for i in range(num_rows):
+        next_row = None
+        for j in range(num_columns):
+            if (len(loop.face.verts) != 4):
+                return None
+            corner_b = _step(loop, forward)
+            corner_c = _step(corner_b, forward)
+            corner_d = _step(loop, not forward)
+            if (i == 0):
+                rows[0].append(loop.vert)
+            rows[i+1].append(corner_d.vert)
+            if (j == 0):
+                # The bottom edge of the first face leads to the next row
+                bottom = corner_c if forward else corner_d
+                twin = bottom.link_loop_radial_next
+                if (twin != bottom):
+                    row_loop = _loop_at(twin, corner_d.vert)
+                    next_row = (row_loop, row_loop.link_loop_next.vert == corner_c.vert)
+            if (j == num_columns - 1):
+                if (i == 0):
+                    rows[0].append(corner_b.vert)
+                rows[i+1].append(corner_c.vert)
+                break
+            side = corner_b if forward else corner_c
+            twin = side.link_loop_radial_next
+            if (twin == side):
+                return None
+            loop = _loop_at(twin, corner_b.vert)
+            forward = loop.link_loop_prev.vert == corner_c.vert
+        if (i < num_rows - 1):
+            if (next_row is None):
+                return None
+            loop, forward = next_row
+    return GridPatch([v for row in rows for v in row], num_rows+1, num_columns+1)
+
+def resolve_grid(bm, num_rows, num_columns, directions, start_vert=None,
+                 across_vert=None, flip=False):
+    """
+    Walk a grid of (rows x columns) faces, starting from start_vert (the
+    active vertex by default) and going in directions defined by directions.
+    When directions is None the grid is walked through face loops towards
+    across_vert (found from the selection history by default).
+    Return a GridPatch, or None if the grid cannot be walked.
+    The mesh and its selection are left untouched.
+    """
+    if (start_vert is None):
+        start_vert = active_vert(bm)
+        if (start_vert is None):
+            return None
+    if (directions is None):
+        if (across_vert is None):
+            across_vert = across_vertex(bm, start_vert)
+            if (across_vert is None):
+                return None
+        return resolve_grid_loops(num_rows, num_columns, start_vert, across_vert, flip)
+    verts = []
+    row_start = start_vert
+    for i in range(num_rows+1):
+        if (i > 0):
+            others = [edge.other_vert(row_start) for edge in row_start.link_edges]
+            row_start = furthest_along_normal(row_start, directions[1], others)
+            if (row_start is None):
+                return None
+        current = row_start
+        verts.append(current)
+        for j in range(num_columns):
+            others = [edge.other_vert(current) for edge in current.link_edges]
+            current = furthest_along_normal(current, directions[0], others)
+            if (current is None):
+                return None
+            verts.append(current)
+    return GridPatch(verts, num_rows+1, num_columns+1)
+
+def edge_between(vert_a, vert_b):
+    """
+    Return the edge connecting two vertices, or None if they
+    are not connected. Only the link_edges of vert_a are visited.
+    """
+    for edge in vert_a.link_edges:
+        if (edge.other_vert(vert_a) == vert_b):
+            return edge
+    return None
+
+def faces_within(verts):
+    """
+    Return every face whose vertices are all contained in verts.
+    Candidates come from the link_faces of verts, so the cost depends
+    on the size of the patch rather than the size of the mesh.
+    """
+    vert_set = set(verts)
+    seen = set()
+    faces = []
+    for v in verts:
+        for f in v.link_faces:
+            if f in seen:
+                continue
+            seen.add(f)
+            if all(fv in vert_set for fv in f.verts):
+                faces.append(f)
+    return faces
+
+def dissolve_grid_edges(bm, vertex_pairs):
+    """
+    Dissolve the edges joining each pair of grid vertices
+    with a single dissolve_edges call.
+    """
+    edges = [edge_between(a, b) for a, b in vertex_pairs]
+    edges = [e for e in edges if e is not None]
+    if (edges):
+        bmesh.ops.dissolve_edges(bm, edges=edges)
+
+# Custom data layer kinds carried over to new geometry. Kinds in the
+# nearest tuples hold identifiers and take the value of the heaviest cell
+# instead of a blend.
+_VERT_KINDS = ("float", "float_color", "color", "float_vector", "shape", "bevel_weight")
+_LOOP_KINDS = ("uv", "float_color", "color", "float", "float_vector")
+_EDGE_KINDS = ("float", "crease", "bevel_weight")
+_FACE_KINDS = ("float", "int")
+_NEAREST_KINDS = ("int",)
+
+def _layers(sequence, kinds):
+    """
+    Yield (kind, layer) for every layer of the given kinds on a bmesh
+    element sequence. Kinds missing from this Blender version are skipped.
+    """
+    for kind in kinds:
+        collection = getattr(sequence.layers, kind, None)
+        if (collection is None):
+            continue
+        for layer in collection.values():
+            if (layer.name != ID_LAYER):
+                yield kind, layer
+
+def _get(elem, kind, layer):
+    return elem[layer].uv if kind == "uv" else elem[layer]
+
+def _set(elem, kind, layer, value):
+    if (kind == "uv"):
+        elem[layer].uv = value
+    elif (kind in _NEAREST_KINDS):
+        elem[layer] = int(value[0])
+    elif (len(value) == 1):
+        elem[layer] = float(value[0])
+    else:
+        elem[layer] = value
+
+def _values(elems, kind, layer):
+    """
+    Return the values of a layer for a list of elements as a 2D array.
+    """
+    return np.array([_get(e, kind, layer) for e in elems], dtype=np.float64).reshape(len(elems), -1)
+
+def has_custom_data(bm):
+    """
+    Return True if the bmesh has any layer capture_custom_data reads.
+    """
+    return any(True for sequence, kinds in ((bm.verts, _VERT_KINDS + _NEAREST_KINDS),
+                                            (bm.loops, _LOOP_KINDS + _NEAREST_KINDS),
+                                            (bm.edges, _EDGE_KINDS))
+               for _ in _layers(sequence, kinds)) or bool(bm.verts.layers.deform.values())
+
+def capture_custom_data(bm, grid):
+    """
+    Take in a bmesh and the vertices of a grid before the patch is
+    rebuilt. Return the value of every custom data layer at each grid cell
+    as one array per layer, with the loop layers read from a face of the
+    patch, the mean of every edge layer over the patch and the attributes
+    of its first face.
+    """
+    faces = faces_within(grid)
+    corner = {}
+    for f in faces:
+        for loop in f.loops:
+            corner.setdefault(loop.vert, loop)
+    loops = [corner.get(v) for v in grid]
+    data = {"vert" : [], "loop" : [], "edge" : [], "face" : [], "deform" : None, "first" : None}
+    for kind, layer in _layers(bm.verts, _VERT_KINDS + _NEAREST_KINDS):
+        data["vert"].append((kind, layer, _values(grid, kind, layer)))
+    if (None not in loops):
+        for kind, layer in _layers(bm.loops, _LOOP_KINDS + _NEAREST_KINDS):
+            data["loop"].append((kind, layer, _values(loops, kind, layer)))
+    edges = list({e for f in faces for e in f.edges})
+    if (edges):
+        for kind, layer in _layers(bm.edges, _EDGE_KINDS):
+            data["edge"].append((kind, layer, _values(edges, kind, layer).mean(axis=0)))
+    deform = bm.verts.layers.deform.active
+    if (deform is not None):
+        groups = sorted({g for v in grid for g in v[deform].keys()})
+        weights = np.zeros((len(grid), len(groups)))
+        for i, v in enumerate(grid):
+            for j, g in enumerate(groups):
+                weights[i, j] = v[deform].get(g, 0.0)
+        data["deform"] = (deform, groups, weights)
+    if (faces):
+        first = faces[0]
+        data["first"] = (first.material_index, first.smooth)
+        for kind, layer in _layers(bm.faces, _FACE_KINDS):
+            data["face"].append((kind, layer, first[layer]))
+    return data
+
+def _blend(pattern, kind, values):
+    """
+    Return the values of a layer at every point of a pattern, mixed with
+    the pattern weights, or taken from the heaviest cell for identifiers.
+    """
+    if (kind in _NEAREST_KINDS):
+        return values[np.argmax(pattern.weights, axis=1)]
+    return pattern.weights @ values
+
+def apply_custom_data(pattern, grid, new_verts, faces, new_edges, data):
+    """
+    Take in the data captured before a pattern was applied and fill in the
+    layers of the moved and created vertices, the loops of the created
+    faces, the created edges and the created faces. Each layer is mixed
+    for all points with a single product with the pattern weights.
+    """
+    moved = [grid[c] for c in pattern.move_cells]
+    targets = moved + new_verts
+    rows = np.concatenate([pattern.move_points, pattern.new_points]).astype(np.int64)
+    for kind, layer, values in data["vert"]:
+        mixed = _blend(pattern, kind, values)
+        for v, value in zip(targets, mixed[rows].tolist()):
+            _set(v, kind, layer, value)
+    if (data["deform"] is not None):
+        layer, groups, weights = data["deform"]
+        mixed = pattern.weights @ weights
+        for v, row in zip(targets, mixed[rows].tolist()):
+            dvert = v[layer]
+            dvert.clear()
+            for g, w in zip(groups, row):
+                if (w > 0):
+                    dvert[g] = w
+    
+    index = {v: i for i, v in enumerate(grid)}
+    for i, v in enumerate(new_verts):
+        index[v] = len(grid) + i
+    new_faces = set(faces)
+    for kind, layer, values in data["loop"]:
+        mixed = _blend(pattern, kind, values)
+        corner = np.concatenate([values, mixed[pattern.new_points]])
+        old = values[pattern.move_cells]
+        corner[pattern.move_cells] = mixed[pattern.move_points]
+        corner_list = corner.tolist()
+        for f in faces:
+            for loop in f.loops:
+                _set(loop, kind, layer, corner_list[index[loop.vert]])
+        # Loops of surrounding faces follow moved vertices within the same island
+        for v, before, after in zip(moved, old, corner[pattern.move_cells].tolist()):
+            for loop in v.link_loops:
+                if (loop.face not in new_faces
+                        and np.allclose(np.reshape(_get(loop, kind, layer), -1), before)):
+                    _set(loop, kind, layer, after)
+    
+    for kind, layer, value in data["edge"]:
+        value = value.tolist()
+        for e in new_edges:
+            _set(e, kind, layer, value)
+    if (data["first"] is not None):
+        material_index, smooth = data["first"]
+        for f in faces:
+            f.material_index = material_index
+            f.smooth = smooth
+            for kind, layer, value in data["face"]:
+                f[layer] = value
+
+def surface_projector(obj, bm):
+    """
+    Return a function placing an (n, 3) array of positions on the nearest
+    point of the surface of obj. The BVH tree is built from the edit mesh
+    on first use and kept until Edit Mode is left, so every operation of
+    an edit session projects onto the surface as it was at the first
+    projected operation, including edits made before it.
+    """
+    ptr = obj.data.as_pointer()
+    tree = _surface_cache.get(ptr)
+    if (tree is None):
+        tree = BVHTree.FromBMesh(bm)
+        _surface_cache[ptr] = tree
+    
+    def project(points):
+        placed = points.copy()
+        for i, co in enumerate(points.tolist()):
+            location = tree.find_nearest(co)[0]
+            if (location is not None):
+                placed[i] = location
+        return placed
+    return project
+
+def apply_pattern(bm, pattern, patch, dissolve, stats=NULL_STATS, project=None):
+    """
+    Take in a compiled pattern and a GridPatch and update mesh topology.
+    New vertex positions come from a single matrix product over the
+    patch coordinates, and are placed on a surface by project if given.
+    Phase timings and counters go to stats.
+    Return the vertices moved or created.
+    """
+    grid = patch.verts
+    points = pattern.points(np.array([v.co for v in grid]))
+    if (project is not None):
+        with stats.phase("project"):
+            placed = pattern.placed_points()
+            points[placed] = project(points[placed])
+    data = None
+    if (has_custom_data(bm)):
+        with stats.phase("custom_data"):
+            data = capture_custom_data(bm, grid)
+    with stats.phase("delete"):
+        for op, args in pattern.steps:
+            if (op == "dissolve_edges"):
+                dissolve_grid_edges(bm, [(grid[a], grid[b]) for a, b in args])
+                stats.count("edges_dissolved", len(args))
+            elif (op == "dissolve_verts"):
+                bmesh.ops.dissolve_verts(bm, verts=[grid[i] for i in args])
+                stats.count("verts_dissolved", len(args))
+            elif (op == "connect_verts"):
+                for a, b in args:
+                    bmesh.ops.connect_verts(bm, verts=[grid[a], grid[b]])
+                stats.count("edges_connected", len(args))
+            elif (op == "delete"):
+                to_delete = []
+                for group in args["faces"]:
+                    to_delete += faces_within([grid[i] for i in group])
+                stats.count("faces_deleted", len(to_delete))
+                if (dissolve and args["edges"]):
+                    edges = [edge_between(grid[a], grid[b]) for a, b in args["edges"]]
+                    edges = [e for e in edges if e is not None]
+                    stats.count("edges_deleted", len(edges))
+                    bmesh.ops.delete(bm, geom=to_delete + edges, context='EDGES_FACES')
+                else:
+                    bmesh.ops.delete(bm, geom=to_delete, context='FACES_KEEP_BOUNDARY')
+    
+    with stats.phase("verts"):
+        for cell, point in zip(pattern.move_cells, pattern.move_points):
+            grid[cell].co = points[point]
+        new_verts = [bm.verts.new(co) for co in points[pattern.new_points].tolist()]
+        verts = grid + new_verts
+    stats.count("verts_moved", len(pattern.move_cells))
+    stats.count("verts_created", len(pattern.new_points))
+    if (data is not None):
+        existing_edges = {e for v in grid for e in v.link_edges}
+    created_faces = []
+    with stats.phase("faces"):
+        for f in pattern.faces():
+            created_faces.append(bm.faces.new([verts[i] for i in f]))
+    stats.count("faces_created", len(created_faces))
+    if (created_faces):
+        with stats.phase("normals"):
+            bmesh.ops.recalc_face_normals(bm, faces=created_faces)
+    if (data is not None):
+        with stats.phase("custom_data"):
+            new_edges = {e for f in created_faces for e in f.edges} - existing_edges
+            apply_custom_data(pattern, grid, new_verts, created_faces, new_edges, data)
+    
+    if (dissolve and len(pattern.dissolve_cells)):
+        with stats.phase("dissolve"):
+            bmesh.ops.dissolve_verts(bm, verts=[grid[i] for i in pattern.dissolve_cells])
+        stats.count("verts_dissolved", len(pattern.dissolve_cells))
+    return [grid[i] for i in pattern.move_cells] + new_verts
+
+def dry_run(obj, bm, type, start_vert, directions, across_vert=None, flip=False,
+            dissolve=False):
+    """
+    Return what applying a reduction at start_vert would turn its grid
+    into, without touching the mesh, as flat buffers: (co, face_sizes,
+    face_loops), co holding the float32 positions of the vertices of the
+    result and the faces as int32 sizes and loops indexing them. Return
+    None if no grid fits. Results are cached per anchor, type and
+    directions until the geometry changes, and are read-only.
+    """
+    if (directions is None and across_vert is None):
+        across_vert = across_vertex(bm, start_vert)
+        if (across_vert is None):
+            return None
+    key = patch_key(obj, type, directions, start_vert, across_vert, flip) + (dissolve,)
+    if (key in _preview_cache):
+        return _preview_cache[key]
+    grid_info = type_definitions[type]
+    patch = resolve_grid(bm, grid_info[0], grid_info[1], directions, start_vert,
+                         across_vert, flip)
+    result = None
+    if (patch is not None):
+        co, face_sizes, face_loops = preview_pattern(patterns[type],
+                                                     np.array([v.co for v in patch.verts]),
+                                                     dissolve)
+        result = (co.astype(np.float32).ravel(), face_sizes.astype(np.int32),
+                  face_loops.astype(np.int32))
+        for buffer in result:
+            buffer.flags.writeable = False
+    if (len(_preview_cache) >= _PREVIEW_CACHE_SIZE):
+        _preview_cache.clear()
+    _preview_cache[key] = result
+    return result
+
+def _snapshot(elem, kind, layer):
+    return np.reshape(_get(elem, kind, layer), -1).tolist()
+
+def _face_key(layer, face):
+    """
+    Return the vertex IDs of a face in loop order, starting at the lowest.
+    """
+    ids = [v[layer] for v in face.verts]
+    start = ids.index(min(ids))
+    return tuple(ids[start:] + ids[:start])
+
+class PatchDelta:
+    """
+    What an operation on one GridPatch changes, recorded so the operation
+    can be reverted in time and memory proportional to the patch. Before
+    the operation it keeps the faces around the grid, with their vertices,
+    edges and custom data, by vertex ID; after it, the IDs of the created
+    vertices and the faces then around the grid, which are checked before
+    a rollback so a mesh edited since is not reverted.
+    """
+    __slots__ = ("grid", "verts", "co", "vert_data", "deform", "faces", "edges", "created",
+                 "after")
+    
+    def __init__(self, bm, ids, patch):
+        layer = ids.layer
+        self.grid = [ids.id_of(v) for v in patch.verts]
+        faces = list({f for v in patch.verts for f in v.link_faces})
+        verts = list({v for f in faces for v in f.verts}.union(patch.verts))
+        edges = {e for v in patch.verts for e in v.link_edges}
+        edges.update(e for f in faces for e in f.edges)
+        self.verts = [ids.id_of(v) for v in verts]
+        self.co = [v.co.copy() for v in verts]
+        self.vert_data = [(kind, vert_layer, [_snapshot(v, kind, vert_layer) for v in verts])
+                          for kind, vert_layer in _layers(bm.verts, _VERT_KINDS + _NEAREST_KINDS)]
+        deform = bm.verts.layers.deform.active
+        self.deform = None
+        if (deform is not None):
+            self.deform = (deform, [dict(v[deform].items()) for v in verts])
+        loop_layers = list(_layers(bm.loops, _LOOP_KINDS + _NEAREST_KINDS))
+        face_layers = list(_layers(bm.faces, _FACE_KINDS))
+        self.faces = []
+        for f in faces:
+            self.faces.append((_face_key(layer, f), [v[layer] for v in f.verts],
+                               f.material_index, f.smooth,
+                               [(face_layer, f[face_layer]) for _, face_layer in face_layers],
+                               [(kind, loop_layer, [_snapshot(loop, kind, loop_layer)
+                                                    for loop in f.loops])
+                                for kind, loop_layer in loop_layers]))
+        edge_layers = list(_layers(bm.edges, _EDGE_KINDS))
+        self.edges = []
+        for e in edges:
+            self.edges.append((e.verts[0][layer], e.verts[1][layer], e.seam, e.smooth,
+                               [(kind, edge_layer, _snapshot(e, kind, edge_layer))
+                                for kind, edge_layer in edge_layers]))
+        self.created = []
+        self.after = None
+    
+    def _faces_around(self, ids):
+        """
+        Return the keys of the faces around the grid and created vertices.
+        """
+        verts = [v for v in map(ids.vert, self.grid + self.created) if v is not None]
+        return frozenset(_face_key(ids.layer, f) for v in verts for f in v.link_faces)
+    
+    def finish(self, bm, ids, touched):
+        """
+        Take in the vertices moved or created by the operation and record
+        what it left behind.
+        """
+        ids.add(touched, len(bm.verts))
+        grid = set(self.grid)
+        self.created = [v[ids.layer] for v in touched
+                        if v.is_valid and v[ids.layer] not in grid]
+        self.after = self._faces_around(ids)
+    
+    def rollback(self, bm, ids):
+        """
+        Put the faces around the grid back as they were before the
+        operation. Return the restored vertices, or None if the mesh was
+        changed since the operation and nothing was reverted.
+        """
+        layer = ids.layer
+        created = [v for v in map(ids.vert, self.created) if v is not None]
+        if (len(created) != len(self.created) or self._faces_around(ids) != self.after):
+            return None
+        if (created):
+            bmesh.ops.delete(bm, geom=created, context='VERTS')
+        
+        keys = {face[0] for face in self.faces}
+        kept = {}
+        stale = []
+        for f in {f for v in map(ids.vert, self.grid) if v is not None for f in v.link_faces}:
+            key = _face_key(layer, f)
+            if (key in keys and key not in kept):
+                kept[key] = f
+            else:
+                stale.append(f)
+        if (stale):
+            bmesh.ops.delete(bm, geom=stale, context='FACES_ONLY')
+        
+        verts = {}
+        for vert_id, co in zip(self.verts, self.co):
+            v = ids.vert(vert_id)
+            if (v is None):
+                v = bm.verts.new(co)
+                ids.put(v, vert_id)
+            else:
+                v.co = co
+            verts[vert_id] = v
+        restored = [verts[vert_id] for vert_id in self.verts]
+        for kind, vert_layer, values in self.vert_data:
+            for v, value in zip(restored, values):
+                _set(v, kind, vert_layer, value)
+        if (self.deform is not None):
+            deform, weights = self.deform
+            for v, groups in zip(restored, weights):
+                dvert = v[deform]
+                dvert.clear()
+                for g, w in groups.items():
+                    dvert[g] = w
+        
+        for key, order, material_index, smooth, face_values, loop_values in self.faces:
+            f = kept.get(key)
+            if (f is None):
+                f = bm.faces.new([verts[vert_id] for vert_id in order])
+                f.material_index = material_index
+                f.smooth = smooth
+                for face_layer, value in face_values:
+                    f[face_layer] = value
+            corner = {vert_id: i for i, vert_id in enumerate(order)}
+            for kind, loop_layer, values in loop_values:
+                for loop in f.loops:
+                    _set(loop, kind, loop_layer, values[corner[loop.vert[layer]]])
+            f.normal_update()
+        
+        edges = {(a, b) for a, b, *_ in self.edges}
+        loose = {e for vert_id in self.grid for e in verts[vert_id].link_edges
+                 if not e.link_faces and (e.verts[0][layer], e.verts[1][layer]) not in edges
+                 and (e.verts[1][layer], e.verts[0][layer]) not in edges}
+        for e in loose:
+            bm.edges.remove(e)
+        for a, b, seam, smooth, edge_values in self.edges:
+            pair = (verts[a], verts[b])
+            e = bm.edges.get(pair)
+            if (e is None):
+                e = bm.edges.new(pair)
+            e.seam = seam
+            e.smooth = smooth
+            for kind, edge_layer, value in edge_values:
+                _set(e, kind, edge_layer, value)
+        for v in restored:
+            v.normal_update()
+        return restored
+
+def apply_tracked(obj, bm, pattern, patch, dissolve, stats=NULL_STATS, project=None):
+    """
+    Apply a pattern at a patch like apply_pattern, recording what it
+    changes. Return (touched, delta), delta being the PatchDelta that
+    reverts the operation.
+    """
+    ids = element_ids(obj, bm)
+    with stats.phase("delta"):
+        delta = PatchDelta(bm, ids, patch)
+    touched = apply_pattern(bm, pattern, patch, dissolve, stats, project)
+    with stats.phase("delta"):
+        delta.finish(bm, ids, touched)
+    return touched, delta
+
+def push_operation(obj, deltas):
+    """
+    Add the PatchDeltas of one operation to the delta journal of obj,
+    dropping the oldest operation past _REVERT_DEPTH.
+    """
+    if (not deltas):
+        return
+    operations = _delta_journal.setdefault(obj.data.as_pointer(), [])
+    operations.append(deltas)
+    if (len(operations) > _REVERT_DEPTH):
+        del operations[0]
+
+def rollback_deltas(obj, bm, deltas):
+    """
+    Revert PatchDeltas, the latest first, and update the lookups of obj.
+    Return the number reverted, which stops short at the first delta whose
+    patch was changed since.
+    """
+    ids = element_ids(obj, bm)
+    reverted = 0
+    for delta in reversed(deltas):
+        restored = delta.rollback(bm, ids)
+        if (restored is None):
+            break
+        update_lookups(obj, bm, restored)
+        reverted += 1
+    return reverted
+
+def patch_key(obj, type, directions, start_vert, across_vert, flip):
+    """
+    Return the key a grid walked from start_vert is cached under, which
+    no longer matches once the geometry of the mesh changes.
+    """
+    if (directions is None):
+        orientation = (hash(across_vert), flip)
+    else:
+        orientation = tuple(directions)
+    return (obj.as_pointer(), hash(start_vert), type, orientation,
+            geometry_generation(obj.data))
+
+def lookup_patch(obj, bm, type, directions, flip=False):
+    """
+    Return the GridPatch for the active vertex of obj, or None.
+    Patches are cached until the geometry of the mesh changes, so poll
+    and execute share a single grid walk.
+    """
+    start_vert = active_vert(bm)
+    if (start_vert is None):
+        return None
+    across_vert = None
+    if (directions is None):
+        across_vert = across_vertex(bm, start_vert)
+        if (across_vert is None):
+            return None
+    key = patch_key(obj, type, directions, start_vert, across_vert, flip)
+    if (key in _patch_cache):
+        patch = _patch_cache[key]
+        if (patch is None or patch.is_valid()):
+            return patch
+    grid_info = type_definitions[type]
+    patch = resolve_grid(bm, grid_info[0], grid_info[1], directions, start_vert,
+                         across_vert, flip)
+    if (len(_patch_cache) >= _PATCH_CACHE_SIZE):
+        _patch_cache.clear()
+    _patch_cache[key] = patch
+    return patch
+
+def batch_anchors(bm):
+    """
+    Return the anchor vertices for a batch: the selected vertices of the
+    selection history in click order, or every selected vertex if the
+    history holds none.
+    """
+    anchors = []
+    seen = set()
+    for elem in bm.select_history:
+        if (isinstance(elem, bmesh.types.BMVert) and elem.select and elem not in seen):
+            seen.add(elem)
+            anchors.append(elem)
+    if (not anchors):
+        anchors = [v for v in bm.verts if v.select]
+    return anchors
+
+def batch_anchor_pairs(bm):
+    """
+    Return (anchors, across) vertex lists for a batch walked through face
+    loops. The selection history is read in pairs: an across vertex, then
+    the adjacent anchor vertex.
+    """
+    history = [elem for elem in bm.select_history
+               if isinstance(elem, bmesh.types.BMVert) and elem.select]
+    anchors, across = [], []
+    for i in range(1, len(history), 2):
+        if (edge_between(history[i], history[i-1]) is not None):
+            anchors.append(history[i])
+            across.append(history[i-1])
+    return anchors, across
+
+def patch_footprint(patch):
+    """
+    Return the faces touching any vertex of a patch. Two patches whose
+    footprints are disjoint can be applied in any order.
+    """
+    return {f for v in patch.verts for f in v.link_faces}
+
+def resolve_patches(bm, anchors, type, directions, across=None, flip=False):
+    """
+    Resolve a grid from every anchor up front. Anchors without a grid, and
+    patches overlapping an earlier one, are skipped.
+    Return (patches, number skipped).
+    """
+    grid_info = type_definitions[type]
+    patches = []
+    for i, anchor in enumerate(anchors):
+        patch = resolve_grid(bm, grid_info[0], grid_info[1], directions, anchor,
+                             across[i] if across else None, flip)
+        if (patch is not None):
+            patches.append(patch)
+    kept = select_disjoint([patch_footprint(p) for p in patches])
+    return [patches[i] for i in kept], len(anchors) - len(kept)
+
+def batch_patches(bm, type, directions, flip=False):
+    """
+    Return (patches, number skipped) for the selected anchors of a batch,
+    read as single anchors or as (across, anchor) pairs when directions
+    is None.
+    """
+    if (directions is None):
+        anchors, across = batch_anchor_pairs(bm)
+    else:
+        anchors, across = batch_anchors(bm), None
+    return resolve_patches(bm, anchors, type, directions, across, flip)
+
+class ElementIds:
+    """
+    Persistent integer IDs of the vertices of a bmesh. IDs live in the
+    ID_LAYER int layer, so they are saved with the mesh and do not change
+    when vertices are added or removed. The index is filled lazily: by_id
+    maps the IDs of the vertices seen so far to their vertex, so an
+    operation only reads the IDs of its own patch, and the whole mesh is
+    only scanned when an ID that was never seen is looked up. The next
+    free ID is kept on the mesh in ID_NEXT_PROPERTY. A vertex without an
+    ID (0), or sharing one with another vertex, gets a new ID. count is
+    the vertex count the index was last brought up to date with.
+    """
+    __slots__ = ("bm", "me", "layer", "by_id", "complete", "count")
+    
+    def __init__(self, me, bm):
+        self.bm = bm
+        self.me = me
+        self.layer = bm.verts.layers.int.get(ID_LAYER)
+        if (self.layer is None):
+            self.layer = bm.verts.layers.int.new(ID_LAYER)
+        self.by_id = {}
+        self.complete = False
+        self.count = len(bm.verts)
+    
+    def index_all(self):
+        """
+        Index every vertex of the bmesh, giving the ones without an ID, or
+        with the ID of another vertex, a new one.
+        """
+        unassigned = []
+        for v in self.bm.verts:
+            vert_id = v[self.layer]
+            known = self.by_id.get(vert_id)
+            if (vert_id <= 0 or (known is not None and known != v and known.is_valid
+                                 and known[self.layer] == vert_id)):
+                unassigned.append(v)
+            else:
+                self.by_id[vert_id] = v
+        next_id = max(self.by_id, default=0) + 1
+        if (next_id > self.me.get(ID_NEXT_PROPERTY, 0)):
+            self.me[ID_NEXT_PROPERTY] = next_id
+        self.complete = True
+        for v in unassigned:
+            self.assign(v)
+    
+    def assign(self, v):
+        """
+        Give a vertex a new ID and return it.
+        """
+        if (ID_NEXT_PROPERTY not in self.me):
+            # Meshes given IDs by an older version keep no counter yet
+            self.index_all()
+        vert_id = self.me[ID_NEXT_PROPERTY]
+        self.me[ID_NEXT_PROPERTY] = vert_id + 1
+        v[self.layer] = vert_id
+        self.by_id[vert_id] = v
+        return vert_id
+    
+    def id_of(self, v):
+        """
+        Return the ID of a vertex, giving it one if it has none yet.
+        """
+        vert_id = v[self.layer]
+        if (vert_id <= 0):
+            return self.assign(v)
+        known = self.by_id.get(vert_id)
+        if (known is None or known == v or not known.is_valid
+                or known[self.layer] != vert_id):
+            self.by_id[vert_id] = v
+            return vert_id
+        return self.assign(v)
+    
+    def vert(self, vert_id):
+        """
+        Return the vertex with an ID, or None if it has been removed.
+        """
+        if (vert_id not in self.by_id and not self.complete):
+            self.index_all()
+        v = self.by_id.get(vert_id)
+        if (v is None or not v.is_valid or v[self.layer] != vert_id):
+            return None
+        return v
+    
+    def put(self, v, vert_id):
+        """
+        Give a vertex restored by a rollback the ID it had before.
+        """
+        v[self.layer] = vert_id
+        self.by_id[vert_id] = v
+    
+    def add(self, verts, count):
+        """
+        Take in vertices touched by an operation and the vertex count
+        after it, and give the new ones an ID.
+        """
+        for v in verts:
+            if (v.is_valid):
+                self.id_of(v)
+        self.count = count
+
+def element_ids(obj, bm):
+    """
+    Return the ElementIds of an edit-mode object, adding the ID layer if
+    the mesh has none. A new, empty index is started when the last one was
+    built from another bmesh, as after an undo, when the vertex count no
+    longer matches, or after any geometry update not made by the add-on.
+    """
+    ptr = obj.data.as_pointer()
+    entry = _id_cache.get(ptr)
+    if (entry is None or entry[0] is not bm or entry[1].count != len(bm.verts)):
+        entry = (bm, ElementIds(obj.data, bm))
+        _id_cache[ptr] = entry
+    return entry[1]
+
+def edit_bmesh(obj):
+    """
+    Return the bmesh of an edit-mode object with the ID layer in place.
+    Adding a layer reallocates the elements and invalidates every
+    reference to them, so it is done before any element is looked up.
+    """
+    bm = bmesh.from_edit_mesh(obj.data)
+    if (bm.verts.layers.int.get(ID_LAYER) is None):
+        bm.verts.layers.int.new(ID_LAYER)
+        # No vertex has an ID yet, so numbering can start without a scan
+        obj.data[ID_NEXT_PROPERTY] = max(obj.data.get(ID_NEXT_PROPERTY, 1), 1)
+    return bm
+
+class MirrorLookup:
+    """
+    Find the vertex at a position of a bmesh. A balanced KD-tree holds the
+    vertices it was built from, and vertices added or moved since are kept
+    in a short list searched directly, until there are enough of them to
+    rebuild the tree. count is the vertex count the lookup was last
+    brought up to date with.
+    """
+    __slots__ = ("tree", "verts", "added", "count")
+    
+    def __init__(self, verts, count):
+        self.verts = [v for v in verts if v.is_valid]
+        self.tree = KDTree(len(self.verts))
+        for i, v in enumerate(self.verts):
+            self.tree.insert(v.co, i)
+        self.tree.balance()
+        self.added = []
+        self.count = count
+    
+    def find(self, co):
+        """
+        Return the vertex within _MIRROR_TOLERANCE of co, or None.
+        """
+        for v in reversed(self.added):
+            if (v.is_valid and (v.co - co).length <= _MIRROR_TOLERANCE):
+                return v
+        for _, i, _ in self.tree.find_n(co, 4):
+            v = self.verts[i]
+            if (v.is_valid and (v.co - co).length <= _MIRROR_TOLERANCE):
+                return v
+        return None
+    
+    def nearest(self, co):
+        """
+        Return the vertex nearest to co, or None if there is none left.
+        """
+        best, best_distance = None, float("inf")
+        for v in self.added:
+            if (v.is_valid and (v.co - co).length < best_distance):
+                best, best_distance = v, (v.co - co).length
+        for _, i, _ in self.tree.find_n(co, 4):
+            v = self.verts[i]
+            if (v.is_valid and (v.co - co).length < best_distance):
+                best, best_distance = v, (v.co - co).length
+        return best
+    
+    def add(self, verts, count):
+        """
+        Take in vertices added or moved by an operation and the vertex
+        count after it.
+        """
+        self.added += verts
+        self.count = count
+        if (len(self.added) > max(64, len(self.verts) // 8)):
+            self.__init__(self.verts + self.added, count)
+
+def mirror_lookup(obj, bm):
+    """
+    Return the MirrorLookup of an edit-mode object. It is rebuilt when it
+    was built from another bmesh, as after an undo, when the vertex count
+    no longer matches, or after any geometry update not made by the add-on.
+    """
+    ptr = obj.data.as_pointer()
+    entry = _mirror_cache.get(ptr)
+    if (entry is None or entry[0] is not bm or entry[1].count != len(bm.verts)):
+        entry = (bm, MirrorLookup(bm.verts, len(bm.verts)))
+        _mirror_cache[ptr] = entry
+    return entry[1]
+
+def mirror_axes(obj, topo_props):
+    """
+    Return the axes (1 for X, 2 for Y, 3 for Z) to mirror operations
+    across, from the panel or from the symmetry settings of the mesh.
+    """
+    if (topo_props.mirror_enum == "NONE"):
+        return ()
+    if (topo_props.mirror_enum == "MESH"):
+        me = obj.data
+        return tuple(axis + 1 for axis, name in enumerate("xyz")
+                     if getattr(me, "use_mirror_" + name, False))
+    return ("XYZ".index(topo_props.mirror_enum) + 1,)
+
+def mirror_patches(obj, bm, patches, type, directions, flip, axes):
+    """
+    Take in resolved patches and mirror axes and return the patches found
+    at every mirror image of their anchors, combining the axes as the
+    mesh symmetry does. Across and Down directions are mirrored with the
+    anchor, and a face-loop walk mirrors its across vertex and walks the
+    other side, as mirroring reverses the winding.
+    """
+    if (not axes or not patches):
+        return []
+    lookup = mirror_lookup(obj, bm)
+    grid_info = type_definitions[type]
+    mirrored = []
+    for mask in range(1, 1 << len(axes)):
+        combo = [axes[i] for i in range(len(axes)) if (mask >> i) & 1]
+        scale = Vector([-1 if axis + 1 in combo else 1 for axis in range(3)])
+        if (directions is None):
+            mirror_directions = None
+            side = flip != (len(combo) % 2 == 1)
+        else:
+            mirror_directions = tuple(-d if abs(d) in combo else d for d in directions)
+            side = flip
+        for patch in patches:
+            anchor = lookup.find(patch.verts[0].co * scale)
+            if (anchor is None):
+                continue
+            across = None
+            if (directions is None):
+                across = lookup.find(patch.verts[1].co * scale)
+                if (across is None):
+                    continue
+            found = resolve_grid(bm, grid_info[0], grid_info[1], mirror_directions, anchor,
+                                 across, side)
+            if (found is not None):
+                mirrored.append(found)
+    return mirrored
+
+def with_mirrored(obj, bm, patches, type, directions, flip, axes):
+    """
+    Return (patches, number skipped) with the mirrored patches added, keeping
+    only those not overlapping an earlier one. An anchor on the mirror
+    plane mirrors onto its own grid, which is then applied once.
+    """
+    mirrored = mirror_patches(obj, bm, patches, type, directions, flip, axes)
+    if (not mirrored):
+        return patches, 0
+    patches = patches + mirrored
+    kept = select_disjoint([patch_footprint(p) for p in patches])
+    return [patches[i] for i in kept], len(patches) - len(kept)
+
+def update_lookups(obj, bm, touched):
+    """
+    Add the vertices moved or created by an operation to the MirrorLookup
+    and ElementIds of obj, if it has them, so neither needs a rebuild.
+    """
+    ptr = obj.data.as_pointer()
+    entry = _mirror_cache.get(ptr)
+    if (entry is not None and entry[0] is bm):
+        entry[1].add(touched, len(bm.verts))
+    entry = _id_cache.get(ptr)
+    if (entry is not None and entry[0] is bm):
+        entry[1].add(touched, len(bm.verts))
+
+def patch_fingerprint(patch):
+    """
+    Return a short hash of the valence of every vertex of a patch, which
+    changes when the neighborhood of a recorded grid was edited.
+    """
+    valences = bytes(min(len(v.link_edges), 255) for v in patch.verts)
+    return hashlib.blake2b(valences, digest_size=8).hexdigest()
+
+def read_journal(obj):
+    """
+    Return the list of journal entries recorded on obj.
+    """
+    return json.loads(obj.get(JOURNAL_PROPERTY, "[]"))
+
+def record_patches(obj, bm, patches, type, directions, flip, dissolve):
+    """
+    Append an entry for each patch about to be applied to the journal of
+    obj. An entry names the anchor, across and down vertices of the grid
+    by ID and position, so replay can find them again on a revised mesh
+    and walk the same face loops, whichever way the grid was found.
+    """
+    ids = element_ids(obj, bm)
+    entries = read_journal(obj)
+    for patch in patches:
+        corners = (patch.verts[0], patch.verts[1], patch.verts[patch.num_columns])
+        entries.append({"type" : type,
+                        "verts" : [[ids.id_of(v)] + [round(c, 6) for c in v.co]
+                                   for v in corners],
+                        "directions" : None if directions is None else list(directions),
+                        "flip" : flip,
+                        "dissolve" : dissolve,
+                        "fingerprint" : patch_fingerprint(patch)})
+    obj[JOURNAL_PROPERTY] = json.dumps(entries, separators=(",", ":"))
+
+def _journal_vert(ids, positions, ref):
+    """
+    Return the vertex a journal reference [id, x, y, z] points to: the
+    vertex with that ID if it is still within an edge length of the
+    recorded position, else the vertex nearest to that position.
+    """
+    co = Vector(ref[1:])
+    v = ids.vert(ref[0])
+    if (v is not None and v.link_edges):
+        reach = min(e.calc_length() for e in v.link_edges)
+        if ((v.co - co).length <= reach):
+            return v
+    return positions().nearest(co)
+
+def replay_journal(obj, entries, project=None):
+    """
+    Re-apply journal entries in order in a single bmesh session with a
+    single edit-mesh update. Each grid is walked again from its anchor
+    through the face loops towards its across vertex, on the side of its
+    down vertex. Return (applied, skipped, changed), changed counting the
+    grids whose neighborhood differs from the recorded one.
+    """
+    me = obj.data
+    bm = edit_bmesh(obj)
+    ids = element_ids(obj, bm)
+    lookup = []
+
+    def positions():
+        if (not lookup):
+            lookup.append(mirror_lookup(obj, bm))
+        return lookup[0]
+
+    stats = instrumentation.begin("replay")
+    applied = skipped = changed = 0
+    deltas = []
+    for entry in entries:
+        type = entry["type"]
+        if (not has_pattern(type)):
+            skipped += 1
+            continue
+        with stats.phase("grid"):
+            anchor, across, down = (_journal_vert(ids, positions, ref) for ref in entry["verts"])
+            grid_info = type_definitions[type]
+            patch = None
+            if (anchor is not None and across is not None and anchor != across):
+                for flip in (entry["flip"], not entry["flip"]):
+                    found = resolve_grid_loops(grid_info[0], grid_info[1], anchor, across, flip)
+                    if (found is not None and (patch is None or found[1][0] == down)):
+                        patch = found
+                        if (found[1][0] == down):
+                            break
+        if (patch is None):
+            skipped += 1
+            continue
+        if (patch_fingerprint(patch) != entry["fingerprint"]):
+            changed += 1
+        touched, delta = apply_tracked(obj, bm, patterns[type], patch, entry["dissolve"],
+                                       stats, project)
+        update_lookups(obj, bm, touched)
+        deltas.append(delta)
+        applied += 1
+    push_operation(obj, deltas)
+    stats.count("patches", applied)
+    stats.count("skipped", skipped)
+    if (applied):
+        with stats.phase("sync"):
+            sync_edit_mesh(me)
+    instrumentation.end(stats)
+    return applied, skipped, changed
+
+def main_batch(type, directions, dissolve, flip=False, project=None, mirror=(),
+               record=False):
+    """
+    Apply one operation at every selected anchor, and at its mirror images
+    across the mirror axes, in a single bmesh session with a single
+    edit-mesh update. With record, the patches are added to the journal.
+    Return (applied, skipped).
+    """
+    obj = bpy.context.object
+    me = obj.data
+    bm = edit_bmesh(obj)
+    stats = instrumentation.begin(type)
+    with stats.phase("grid"):
+        patches, skipped = batch_patches(bm, type, directions, flip)
+    if (mirror):
+        with stats.phase("mirror"):
+            patches, overlapping = with_mirrored(obj, bm, patches, type, directions, flip,
+                                                 mirror)
+        skipped += overlapping
+    if (record):
+        record_patches(obj, bm, patches, type, directions, flip, dissolve)
+    touched, deltas = [], []
+    for patch in patches:
+        moved, delta = apply_tracked(obj, bm, patterns[type], patch, dissolve, stats, project)
+        touched += moved
+        deltas.append(delta)
+    update_lookups(obj, bm, touched)
+    push_operation(obj, deltas)
+    stats.count("patches", len(patches))
+    stats.count("skipped", skipped)
+    if (patches):
+        with stats.phase("sync"):
+            sync_edit_mesh(me)
+    instrumentation.end(stats)
+    return len(patches), skipped
+
+def main(type, directions, dissolve, patch=None, flip=False, project=None, mirror=(),
+         record=False):
+    obj = bpy.context.object
+    me = obj.data
+    bm = edit_bmesh(obj)
+    stats = instrumentation.begin(type)
+    if (patch is None):
+        with stats.phase("grid"):
+            patch = lookup_patch(obj, bm, type, directions, flip)
+        if (patch is None):
+            stats.count("skipped")
+            instrumentation.end(stats)
+            return False
+    patches = [patch]
+    if (mirror):
+        with stats.phase("mirror"):
+            patches, _ = with_mirrored(obj, bm, patches, type, directions, flip, mirror)
+    if (record):
+        record_patches(obj, bm, patches, type, directions, flip, dissolve)
+    touched, deltas = [], []
+    for patch in patches:
+        moved, delta = apply_tracked(obj, bm, patterns[type], patch, dissolve, stats, project)
+        touched += moved
+        deltas.append(delta)
+    update_lookups(obj, bm, touched)
+    push_operation(obj, deltas)
+    with stats.phase("sync"):
+        sync_edit_mesh(me)
+    instrumentation.end(stats)
+    return True
+
+def sync_edit_mesh(me, topology_changed=True):
+    """
+    Push edit-mesh changes to the viewport. When only coordinates moved,
+    the tessellation and the destructive rebuild of derived data are
+    skipped.
+    """
+    if (topology_changed):
+        _own_updates.add(me.as_pointer())
+    bmesh.update_edit_mesh(me, loop_triangles=topology_changed,
+                           destructive=topology_changed)
+
+def read_mesh_arrays(me):
+    """
+    Take in an object-mode mesh and return a PolyMesh of its vertices
+    and polygons, read with foreach_get.
+    """
+    co = np.empty(len(me.vertices)*3, dtype=np.float64)
+    me.vertices.foreach_get("co", co)
+    face_start = np.empty(len(me.polygons), dtype=np.int64)
+    me.polygons.foreach_get("loop_start", face_start)
+    face_size = np.empty(len(me.polygons), dtype=np.int64)
+    me.polygons.foreach_get("loop_total", face_size)
+    loop_vert = np.empty(len(me.loops), dtype=np.int64)
+    me.loops.foreach_get("vertex_index", loop_vert)
+    return PolyMesh(co.reshape(-1, 3), face_start, face_size, loop_vert)
+
+def write_mesh_arrays(me, mesh):
+    """
+    Replace the geometry of an object-mode mesh with the live geometry of
+    a PolyMesh, written with foreach_set. Edges are rebuilt from the
+    polygons, so per-edge, per-loop and per-vertex layers are dropped.
+    The shading of the first face is given to every face, which keeps it
+    when all faces share it, as has_extra_layers requires.
+    """
+    mesh = mesh.compacted()
+    num_faces = mesh.num_faces
+    face_size = mesh.face_size[:num_faces]
+    smooth = bool(len(me.polygons) and me.polygons[0].use_smooth)
+    me.clear_geometry()
+    me.vertices.add(mesh.num_verts)
+    me.vertices.foreach_set("co", mesh.co[:mesh.num_verts].astype(np.float32).ravel())
+    me.loops.add(int(face_size.sum()))
+    me.loops.foreach_set("vertex_index", mesh.loop_vert[:len(me.loops)].astype(np.int32))
+    me.polygons.add(num_faces)
+    me.polygons.foreach_set("loop_start", mesh.face_start[:num_faces].astype(np.int32))
+    if (bpy.app.version < (3, 6, 0)):
+        me.polygons.foreach_set("loop_total", face_size.astype(np.int32))
+    me.update(calc_edges=True)
+    me.polygons.foreach_set("use_smooth", np.full(num_faces, smooth))
+
+def read_vert_ids(me):
+    """
+    Return the persistent vertex IDs of an object-mode mesh, with 0 for
+    vertices without one.
+    """
+    ids = np.zeros(len(me.vertices), dtype=np.int32)
+    attribute = me.attributes.get(ID_LAYER) if hasattr(me, "attributes") else None
+    if (attribute is not None and attribute.domain == 'POINT' and attribute.data_type == 'INT'):
+        attribute.data.foreach_get("value", ids)
+    return ids
+
+def write_vert_ids(me, ids):
+    """
+    Store persistent vertex IDs on an object-mode mesh.
+    """
+    if (not hasattr(me, "attributes")):
+        return
+    attribute = me.attributes.get(ID_LAYER)
+    if (attribute is None):
+        attribute = me.attributes.new(ID_LAYER, 'INT', 'POINT')
+    attribute.data.foreach_set("value", ids.astype(np.int32))
+
+def selected_vert_indices(me):
+    """
+    Return the indices of the selected vertices of an object-mode mesh.
+    """
+    select = np.empty(len(me.vertices), dtype=bool)
+    me.vertices.foreach_get("select", select)
+    return np.flatnonzero(select)
+
+def selected_face_indices(me):
+    """
+    Return the indices of the selected faces of an object-mode mesh.
+    """
+    select = np.empty(len(me.polygons), dtype=bool)
+    me.polygons.foreach_get("select", select)
+    return np.flatnonzero(select)
+
+def _any_set(collection, name, dtype=bool):
+    """
+    Return True if any element of a mesh collection has a non-zero value
+    for the property name.
+    """
+    values = np.zeros(len(collection), dtype=dtype)
+    collection.foreach_get(name, values)
+    return bool(values.any())
+
+def _all_set(collection, name):
+    """
+    Return True if every element of a mesh collection has the boolean
+    property name set.
+    """
+    values = np.zeros(len(collection), dtype=bool)
+    collection.foreach_get(name, values)
+    return bool(values.all())
+
+def has_extra_layers(obj):
+    """
+    Return True if the object's mesh holds data the object-mode path
+    does not carry over: write_mesh_arrays keeps only positions, faces and
+    vertex IDs and shading shared by all faces, so any other attribute,
+    material index, mixed smooth and flat shading, seam, sharp edge or
+    crease counts.
+    """
+    me = obj.data
+    if (len(me.uv_layers) or len(getattr(me, "vertex_colors", ())) or me.shape_keys
+            or len(obj.vertex_groups)):
+        return True
+    if (_any_set(me.polygons, "material_index", np.int32)
+            or _any_set(me.edges, "use_seam") or _any_set(me.edges, "use_edge_sharp")):
+        return True
+    # Before 4.1 smooth shading is a face flag, later a sharp_face attribute
+    if (_any_set(me.polygons, "use_smooth") and not _all_set(me.polygons, "use_smooth")):
+        return True
+    if (bpy.app.version < (4, 0, 0) and (_any_set(me.edges, "crease", np.float32)
+                                         or _any_set(me.edges, "bevel_weight", np.float32))):
+        return True
+    # Names starting with a dot are internal, such as selection and UV pin flags
+    return any(not attribute.name.startswith(".") and attribute.name not in _KEPT_ATTRIBUTES
+               for attribute in getattr(me, "attributes", ()))
+
+def site_mesh(obj):
+    """
+    Return a PolyMesh copy of an edit-mode object for site analysis, with
+    the ID of each of its vertices. The copy, and the sites found on it,
+    are reused until the geometry of the mesh changes.
+    """
+    ptr = obj.as_pointer()
+    generation = geometry_generation(obj.data)
+    cached = _site_meshes.get(ptr)
+    if (cached is not None and cached[0] == generation):
+        return cached[1], cached[2]
+    # Give every vertex an ID. Attributes read back empty in Edit Mode,
+    # so the IDs come from the bmesh, whose order the copy keeps
+    bm = edit_bmesh(obj)
+    index = element_ids(obj, bm)
+    index.index_all()
+    ids = np.fromiter((v[index.layer] for v in bm.verts), dtype=np.int32, count=len(bm.verts))
+    obj.update_from_editmode()
+    mesh = read_mesh_arrays(obj.data)
+    _site_meshes[ptr] = (generation, mesh, ids)
+    return mesh, ids
+
+def site_verts(obj, bm, ids, indices):
+    """
+    Return the bmesh vertices at vertex indices of the site_mesh copy,
+    matched through their IDs, with None for removed vertices.
+    """
+    if (not ids.any()):
+        # Meshes without attribute access keep no IDs, use the vertex order
+        bm.verts.ensure_lookup_table()
+        return [bm.verts[i] for i in np.asarray(indices).tolist()]
+    index = element_ids(obj, bm)
+    return [index.vert(vert_id) for vert_id in ids[indices].tolist()]
+
+def analyse_sites(obj, type, min_density_ratio):
+    """
+    Return the (anchors, across, flip) arrays of every site of type on an
+    edit-mode object, and the vertex IDs the anchor and across indices
+    refer to.
+    """
+    mesh, ids = site_mesh(obj)
+    return find_sites(mesh, type, min_density_ratio if min_density_ratio > 0 else None) + (ids,)
+
+def site_patches(obj, bm, type, min_density_ratio):
+    """
+    Return (patches, number skipped) for the sites of type whose anchor
+    vertex is selected, without overlapping patches.
+    """
+    anchors, across, flip, ids = analyse_sites(obj, type, min_density_ratio)
+    grid_info = type_definitions[type]
+    unique, position = np.unique(anchors, return_inverse=True)
+    anchor_verts = site_verts(obj, bm, ids, unique)
+    selected = np.array([v is not None and v.select for v in anchor_verts], dtype=bool)
+    chosen = np.flatnonzero(selected[position])
+    across_verts = site_verts(obj, bm, ids, across[chosen])
+    patches = []
+    for i, across_vert in zip(chosen.tolist(), across_verts):
+        if (across_vert is None):
+            continue
+        patch = resolve_grid_loops(grid_info[0], grid_info[1], anchor_verts[position[i]],
+                                   across_vert, bool(flip[i]))
+        if (patch is not None):
+            patches.append(patch)
+    kept = select_disjoint([patch_footprint(p) for p in patches])
+    return [patches[i] for i in kept], len(patches) - len(kept)
+
+def main_sites(obj, type, dissolve, min_density_ratio, project=None):
+    """
+    Apply one operation at the sites whose anchor vertex is selected, in a
+    single bmesh session with a single edit-mesh update.
+    Return (applied, skipped).
+    """
+    me = obj.data
+    bm = edit_bmesh(obj)
+    stats = instrumentation.begin(type)
+    with stats.phase("grid"):
+        patches, skipped = site_patches(obj, bm, type, min_density_ratio)
+    touched, deltas = [], []
+    for patch in patches:
+        moved, delta = apply_tracked(obj, bm, patterns[type], patch, dissolve, stats, project)
+        touched += moved
+        deltas.append(delta)
+    update_lookups(obj, bm, touched)
+    push_operation(obj, deltas)
+    stats.count("patches", len(patches))
+    if (patches):
+        with stats.phase("sync"):
+            sync_edit_mesh(me)
+    instrumentation.end(stats)
+    return len(patches), skipped
+
+def main_object(obj, type, directions, dissolve):
+    """
+    Apply one operation at every selected vertex of an object-mode mesh
+    on NumPy arrays, without building a bmesh. Return (applied, skipped).
+    """
+    me = obj.data
+    stats = instrumentation.begin(type)
+    with stats.phase("read"):
+        mesh = read_mesh_arrays(me)
+        anchors = selected_vert_indices(me)
+        ids = read_vert_ids(me)
+    with stats.phase("apply"):
+        applied = reduce_many(mesh, anchors, type, directions, dissolve)
+    stats.count("patches", applied)
+    if (applied):
+        with stats.phase("sync"):
+            write_mesh_arrays(me, mesh)
+            # Surviving vertices keep their IDs, new ones get one in Edit Mode
+            if (ids.any()):
+                all_ids = np.zeros(mesh.num_verts, dtype=np.int32)
+                all_ids[:len(ids)] = ids
+                write_vert_ids(me, all_ids[mesh.vert_alive[:mesh.num_verts]])
+    instrumentation.end(stats)
+    return applied, len(anchors) - applied
+    
+    
+class TopologyProperties(bpy.types.PropertyGroup):
+    type_enum : bpy.props.EnumProperty(
+        name="Topo Types",
+        description="Select an option",
+        items=[("1to2", "1 to 2", "1 face to 2"),
+               ("1to3", "1 to 3", "1 face to 3"),
+               ("1to4", "1 to 4", "1 face to 4"),
+               ("2to1", "2 to 1", "2 faces to 1"),
+               ('3to1', "3 to 1", "3 faces to 1"),
+               ("4to1", "4 to 1", "4 faces to 1"),
+               ("4to2", "4 to 2", "4 faces to 2"),
+               ("5to3", "5 to 3", "5 faces to 3"),
+               ("NTOM", "N to M", "Any number of faces to fewer, tiled from the "
+                                  "reductions above")
+               ]
+    )
+    
+    from_int : bpy.props.IntProperty(
+        name="From",
+        description="Number of faces across the first row",
+        default = 6,
+        min = 2,
+        max = 256)
+    
+    to_int : bpy.props.IntProperty(
+        name="To",
+        description="Number of faces across the last row",
+        default = 2,
+        min = 1,
+        max = 256)
+    
+    orientation_enum : bpy.props.EnumProperty(
+        name="Orientation",
+        description="How the grid is found from the active vertex",
+        items=[("AXIS", "Axes", "Walk along the Across and Down axes"),
+               ("TOPOLOGY", "Face Loops", "Walk the quads from the active vertex towards "
+                                          "the previously selected vertex")]
+    )
+    
+    flip_bool : bpy.props.BoolProperty(
+        name="Flip Side",
+        description="Walk the rows on the other side of the first edge",
+        default = False)
+    
+    preview_bool : bpy.props.BoolProperty(
+        name="Preview",
+        description="Draw the faces the reduction would build at the active vertex",
+        default = False)
+    
+    record_bool : bpy.props.BoolProperty(
+        name="Record",
+        description="Add each operation in Edit Mode to the journal of the object, "
+                    "so it can be replayed on a revised mesh",
+        default = True)
+    
+    across_enum : bpy.props.EnumProperty(
+        name="Across Direction",
+        description="Select an option",
+        items=[('1', "+X", ""),
+               ("-1", "-X", ""),
+               ('2', "+Y", ""),
+               ("-2", "-Y", ""),
+               ('3', "+Z", ""),
+               ("-3", "-Z", "")]
+    )
+    
+    down_enum : bpy.props.EnumProperty(
+        name="Down Direction",
+        description="Select an option",
+        items=[('1', "+X", ""),
+               ("-1", "-X", ""),
+               ('2', "+Y", ""),
+               ("-2", "-Y", ""),
+               ('3', "+Z", ""),
+               ("-3", "-Z", "")]
+    )
+    
+    dissolve_bool : bpy.props.BoolProperty(
+        name="Dissolve Extra Verts",
+        default = False)
+    
+    batch_bool : bpy.props.BoolProperty(
+        name="Apply at All Selected",
+        description="Use every selected vertex as a top-left anchor",
+        default = False)
+    
+    density_float : bpy.props.FloatProperty(
+        name="Min Density Ratio",
+        description="Only find sites whose faces grow at least this much from the first "
+                    "to the last row (0 finds every site)",
+        default = 0.0,
+        min = 0.0)
+    
+    site_count : bpy.props.IntProperty(
+        name="Sites",
+        default = 0)
+    
+    project_bool : bpy.props.BoolProperty(
+        name="Project to Surface",
+        description="Place moved and new vertices on the surface the mesh had at the first "
+                    "projected operation of the edit session, instead of on straight lines "
+                    "between grid vertices",
+        default = False)
+    
+    mirror_enum : bpy.props.EnumProperty(
+        name="Mirror",
+        description="Also apply each operation at the mirror image of its grid",
+        items=[("NONE", "Off", "Apply only where selected"),
+               ("MESH", "Mesh Symmetry", "Mirror across the axes enabled in the mesh "
+                                         "symmetry settings"),
+               ("X", "X", "Mirror across the local X axis"),
+               ("Y", "Y", "Mirror across the local Y axis"),
+               ("Z", "Z", "Mirror across the local Z axis")]
+    )
+    
+    stats_bool : bpy.props.BoolProperty(
+        name="Collect Stats",
+        description="Time each phase of an operation and count the geometry it touches",
+        default = False)
+    
+    log_path : bpy.props.StringProperty(
+        name="Stats Log",
+        description="Append the stats of every operation to this file as JSON lines",
+        subtype='FILE_PATH',
+        default = "")
+    
+class TopologyOperator(bpy.types.Operator):
+    """Tooltip"""
+    bl_idname = "object.topology_operator"
+    bl_label = "Topology Operator"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        if (obj is None or obj.type != 'MESH' or obj.mode not in ("EDIT", "OBJECT")):
+            return False
+        topo_props = context.scene.topo_props
+        if (not has_pattern(panel_type(topo_props))):
+            return False
+        directions = panel_directions(topo_props)
+        if (obj.mode == "OBJECT"):
+            if (directions is None):
+                return False
+            # total_vert_sel is only kept up to date in Edit Mode
+            num_selected = len(selected_vert_indices(obj.data))
+            return num_selected == 1 or (topo_props.batch_bool and num_selected > 0)
+        if (topo_props.batch_bool):
+            return obj.data.total_vert_sel > 0
+        if (obj.data.total_vert_sel != (1 if directions else 2)):
+            return False
+        bm = bmesh.from_edit_mesh(obj.data)
+        return lookup_patch(obj, bm, panel_type(topo_props), directions,
+                            topo_props.flip_bool) is not None
+
+    def execute(self, context):
+        obj = context.active_object
+        topo_props = context.scene.topo_props
+        directions = panel_directions(topo_props)
+        instrumentation.enabled = topo_props.stats_bool
+        instrumentation.log_path = bpy.path.abspath(topo_props.log_path)
+        if (obj.mode == "OBJECT"):
+            if (has_extra_layers(obj)):
+                # Rebuilding from arrays would drop the extra data, bmesh keeps it
+                bpy.ops.object.mode_set(mode='EDIT')
+                applied, skipped = main_batch(panel_type(topo_props), directions,
+                                              topo_props.dissolve_bool)
+                bpy.ops.object.mode_set(mode='OBJECT')
+            else:
+                applied, skipped = main_object(obj, panel_type(topo_props), directions,
+                                               topo_props.dissolve_bool)
+            if (not applied):
+                self.report({'WARNING'}, "No grid found from the selected vertices")
+                return {'CANCELLED'}
+            self.report({'INFO'}, "Applied %d reductions, skipped %d" % (applied, skipped))
+            return {'FINISHED'}
+        project = operation_projector(obj, topo_props)
+        mirror = mirror_axes(obj, topo_props)
+        if (topo_props.batch_bool):
+            applied, skipped = main_batch(panel_type(topo_props), directions,
+                                          topo_props.dissolve_bool, topo_props.flip_bool,
+                                          project, mirror, topo_props.record_bool)
+            if (not applied):
+                self.report({'WARNING'}, "No grid found from the selected vertices")
+                return {'CANCELLED'}
+            self.report({'INFO'}, "Applied %d reductions, skipped %d" % (applied, skipped))
+            return {'FINISHED'}
+        bm = edit_bmesh(obj)
+        patch = lookup_patch(obj, bm, panel_type(topo_props), directions, topo_props.flip_bool)
+        if (patch is None):
+            self.report({'WARNING'}, "No grid found from the active vertex")
+            return {'CANCELLED'}
+        main(panel_type(topo_props), directions, topo_props.dissolve_bool, patch,
+             topo_props.flip_bool, project, mirror, topo_props.record_bool)
+        return {'FINISHED'}
+
+class RevertOperator(bpy.types.Operator):
+    """Revert the last reduction of this Edit Mode session, restoring only the faces it changed"""
+    bl_idname = "object.topology_revert"
+    bl_label = "Revert Last"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return (obj is not None and obj.type == 'MESH' and obj.mode == "EDIT"
+                and bool(_delta_journal.get(obj.data.as_pointer())))
+    
+    def execute(self, context):
+        obj = context.active_object
+        operations = _delta_journal[obj.data.as_pointer()]
+        deltas = operations.pop()
+        bm = edit_bmesh(obj)
+        reverted = rollback_deltas(obj, bm, deltas)
+        if (reverted):
+            sync_edit_mesh(obj.data)
+        if (reverted < len(deltas)):
+            operations.clear()
+            self.report({'WARNING'}, "Reverted %d of %d reductions, the mesh was edited since"
+                        % (reverted, len(deltas)))
+            return {'FINISHED'} if reverted else {'CANCELLED'}
+        self.report({'INFO'}, "Reverted %d reductions" % reverted)
+        return {'FINISHED'}
+
+class FindSitesOperator(bpy.types.Operator):
+    """Select every vertex from which the chosen reduction fits a regular quad grid"""
+    bl_idname = "object.topology_find_sites"
+    bl_label = "Find Sites"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return (obj is not None and obj.type == 'MESH' and obj.mode == "EDIT"
+                and has_pattern(panel_type(context.scene.topo_props)))
+    
+    def execute(self, context):
+        obj = context.active_object
+        topo_props = context.scene.topo_props
+        anchors, across, flip, ids = analyse_sites(obj, panel_type(topo_props),
+                                                   topo_props.density_float)
+        bpy.ops.mesh.select_all(action='DESELECT')
+        bm = edit_bmesh(obj)
+        unique = np.unique(anchors)
+        for v in site_verts(obj, bm, ids, unique):
+            if (v is not None):
+                v.select = True
+        bm.select_history.clear()
+        bm.select_flush(False)
+        sync_edit_mesh(obj.data, topology_changed=False)
+        topo_props.site_count = len(anchors)
+        self.report({'INFO'}, "Found %d sites at %d vertices" % (len(anchors), len(unique)))
+        return {'FINISHED'}
+
+class ApplySitesOperator(bpy.types.Operator):
+    """Apply the chosen reduction at the found sites whose anchor vertex is selected"""
+    bl_idname = "object.topology_apply_sites"
+    bl_label = "Apply at Sites"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return (obj is not None and obj.type == 'MESH' and obj.mode == "EDIT"
+                and obj.data.total_vert_sel > 0
+                and has_pattern(panel_type(context.scene.topo_props)))
+    
+    def execute(self, context):
+        obj = context.active_object
+        topo_props = context.scene.topo_props
+        instrumentation.enabled = topo_props.stats_bool
+        instrumentation.log_path = bpy.path.abspath(topo_props.log_path)
+        applied, skipped = main_sites(obj, panel_type(topo_props), topo_props.dissolve_bool,
+                                      topo_props.density_float,
+                                      operation_projector(obj, topo_props))
+        if (not applied):
+            self.report({'WARNING'}, "No site found at the selected vertices")
+            return {'CANCELLED'}
+        self.report({'INFO'}, "Applied %d reductions, skipped %d" % (applied, skipped))
+        return {'FINISHED'}
+
+class AuditOperator(bpy.types.Operator):
+    """Check the selected faces, or the whole mesh, for triangles, n-gons, poles, flipped and non-manifold edges"""
+    bl_idname = "object.topology_audit"
+    bl_label = "Audit Topology"
+    
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return obj is not None and obj.type == 'MESH' and obj.mode in ("EDIT", "OBJECT")
+    
+    def execute(self, context):
+        obj = context.active_object
+        if (obj.mode == "EDIT"):
+            obj.update_from_editmode()
+        mesh = read_mesh_arrays(obj.data)
+        faces = selected_face_indices(obj.data)
+        report = audit(mesh, faces if len(faces) else None)
+        _last_audit["report"] = report
+        self.report({'INFO'}, "%d faces: %d triangles, %d n-gons, %d flipped, %d non-manifold" % (
+                    report["faces"], report["triangles"], report["ngons"],
+                    report["flipped_edges"], report["non_manifold_edges"]))
+        return {'FINISHED'}
+
+def journal_source(context):
+    """
+    Return the object whose journal is replayed on the active object: the
+    other selected object if there is exactly one, else the active object.
+    """
+    obj = context.active_object
+    others = [o for o in context.selected_objects if o != obj]
+    return others[0] if len(others) == 1 else obj
+
+class ReplayJournalOperator(bpy.types.Operator):
+    """Re-apply the recorded operations of the active object, or of the other selected object, to the active mesh"""
+    bl_idname = "object.topology_replay_journal"
+    bl_label = "Replay Journal"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return (obj is not None and obj.type == 'MESH' and obj.mode == "EDIT"
+                and JOURNAL_PROPERTY in journal_source(context))
+    
+    def execute(self, context):
+        obj = context.active_object
+        topo_props = context.scene.topo_props
+        instrumentation.enabled = topo_props.stats_bool
+        instrumentation.log_path = bpy.path.abspath(topo_props.log_path)
+        entries = read_journal(journal_source(context))
+        applied, skipped, changed = replay_journal(obj, entries,
+                                                   operation_projector(obj, topo_props))
+        if (not applied):
+            self.report({'WARNING'}, "No recorded grid found on this mesh")
+            return {'CANCELLED'}
+        self.report({'INFO'}, "Replayed %d operations, skipped %d, %d on changed grids" % (
+                    applied, skipped, changed))
+        return {'FINISHED'}
+
+class ClearJournalOperator(bpy.types.Operator):
+    """Remove the recorded operations of the active object"""
+    bl_idname = "object.topology_clear_journal"
+    bl_label = "Clear Journal"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return obj is not None and JOURNAL_PROPERTY in obj
+    
+    def execute(self, context):
+        del context.active_object[JOURNAL_PROPERTY]
+        return {'FINISHED'}
+
+class ChunkedBatchOperator(bpy.types.Operator):
+    """Apply the reduction at many places in short chunks, keeping the interface responsive. Press Esc to cancel"""
+    bl_idname = "object.topology_chunked_batch"
+    bl_label = "Run in Chunks"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    source : bpy.props.EnumProperty(
+        name="Source",
+        items=[("SELECTED", "Selected", "Use the selected vertices as anchors"),
+               ("SITES", "Sites", "Use the found sites whose anchor vertex is selected")]
+    )
+    
+    @classmethod
+    def poll(cls, context):
+        obj = context.active_object
+        return (obj is not None and obj.type == 'MESH' and obj.mode == "EDIT"
+                and obj.data.total_vert_sel > 0 and not _batch_progress["running"]
+                and has_pattern(panel_type(context.scene.topo_props)))
+    
+    def gather(self, context):
+        """
+        Resolve every patch of the batch up front. Return False if there
+        is none.
+        """
+        obj = context.active_object
+        topo_props = context.scene.topo_props
+        instrumentation.enabled = topo_props.stats_bool
+        instrumentation.log_path = bpy.path.abspath(topo_props.log_path)
+        self._obj = obj
+        self._type = panel_type(topo_props)
+        self._dissolve = topo_props.dissolve_bool
+        self._bm = edit_bmesh(obj)
+        self._project = operation_projector(obj, topo_props)
+        self._stats = instrumentation.begin(self._type)
+        with self._stats.phase("grid"):
+            if (self.source == "SITES"):
+                self._patches, self._skipped = site_patches(obj, self._bm, self._type,
+                                                            topo_props.density_float)
+            else:
+                directions = panel_directions(topo_props)
+                self._patches, self._skipped = batch_patches(self._bm, self._type, directions,
+                                                             topo_props.flip_bool)
+                mirror = mirror_axes(obj, topo_props)
+                if (mirror):
+                    self._patches, overlapping = with_mirrored(obj, self._bm, self._patches,
+                                                               self._type, directions,
+                                                               topo_props.flip_bool, mirror)
+                    self._skipped += overlapping
+        if (not self._patches):
+            instrumentation.end(self._stats)
+            self.report({'WARNING'}, "No grid found from the selected vertices")
+            return False
+        return True
+    
+    def execute(self, context):
+        # Without an event loop, as when redoing, the whole batch runs at once
+        if (not self.gather(context)):
+            return {'CANCELLED'}
+        deltas = []
+        for patch in self._patches:
+            touched, delta = apply_tracked(self._obj, self._bm, patterns[self._type], patch,
+                                           self._dissolve, self._stats, self._project)
+            update_lookups(self._obj, self._bm, touched)
+            deltas.append(delta)
+        push_operation(self._obj, deltas)
+        with self._stats.phase("sync"):
+            sync_edit_mesh(self._obj.data)
+        self._stats.count("patches", len(self._patches))
+        self._stats.count("skipped", self._skipped)
+        instrumentation.end(self._stats)
+        return {'FINISHED'}
+    
+    def invoke(self, context, event):
+        if (not self.gather(context)):
+            return {'CANCELLED'}
+        self._deltas = []
+        self._next = 0
+        self._applied = 0
+        _batch_progress.update(running=True, done=0, total=len(self._patches))
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        # Undo would rebuild the edit mesh under the running batch
+        if (event.type == 'Z' and (event.ctrl or event.oskey)):
+            return {'RUNNING_MODAL'}
+        if (self._obj.mode != "EDIT"):
+            self.stop(context)
+            self.report({'WARNING'}, "Batch stopped after %d reductions, Edit Mode was left"
+                        % self._applied)
+            return {'FINISHED'}
+        if (not self._bm.is_valid):
+            # Another operator replaced the edit mesh, the deltas no longer apply
+            self.stop(context)
+            self.report({'WARNING'}, "Batch stopped after %d reductions, the mesh was "
+                        "replaced by another operation" % self._applied)
+            return {'CANCELLED'}
+        if (event.type == 'ESC' and event.value == 'PRESS'):
+            self.rollback(context)
+            self.stop(context)
+            self.report({'INFO'}, "Batch cancelled")
+            return {'CANCELLED'}
+        if (event.type != 'TIMER'):
+            return {'PASS_THROUGH'}
+        
+        deadline = time.perf_counter() + _CHUNK_SECONDS
+        pattern = patterns[self._type]
+        while (self._next < len(self._patches) and time.perf_counter() < deadline):
+            patch = self._patches[self._next]
+            self._next += 1
+            # Skip patches broken by edits made while the batch was running
+            if (patch.is_valid()):
+                touched, delta = apply_tracked(self._obj, self._bm, pattern, patch,
+                                               self._dissolve, self._stats, self._project)
+                update_lookups(self._obj, self._bm, touched)
+                self._deltas.append(delta)
+                self._applied += 1
+            else:
+                self._skipped += 1
+        _batch_progress["done"] = self._next
+        redraw_panels(context)
+        if (self._next < len(self._patches)):
+            return {'RUNNING_MODAL'}
+        
+        push_operation(self._obj, self._deltas)
+        with self._stats.phase("sync"):
+            sync_edit_mesh(self._obj.data)
+        self.stop(context)
+        self.report({'INFO'}, "Applied %d reductions, skipped %d" % (self._applied, self._skipped))
+        return {'FINISHED'}
+    
+    def rollback(self, context):
+        """
+        Revert the reductions applied so far from their deltas, in time
+        proportional to the patches touched.
+        """
+        rollback_deltas(self._obj, self._bm, self._deltas)
+        sync_edit_mesh(self._obj.data)
+    
+    def stop(self, context):
+        """
+        End the run, whichever way it ends, and close its statistics.
+        """
+        self._stats.count("patches", self._applied)
+        self._stats.count("skipped", self._skipped)
+        instrumentation.end(self._stats)
+        context.window_manager.event_timer_remove(self._timer)
+        self._patches = []
+        self._deltas = []
+        _batch_progress.update(running=False, done=0, total=0)
+        redraw_panels(context)
+
+def preview_lines(result, matrix):
+    """
+    Take in a dry-run result and an object matrix, and return the world
+    positions of the edges of the faces it would build, two per edge.
+    """
+    co, face_sizes, face_loops = result
+    world = np.array(matrix, dtype=np.float32)
+    points = co.reshape(-1, 3) @ world[:3, :3].T + world[:3, 3]
+    starts = np.cumsum(face_sizes) - face_sizes
+    following = np.arange(1, len(face_loops) + 1)
+    following[starts + face_sizes - 1] = starts
+    return points[np.stack([face_loops, face_loops[following]], axis=1).ravel()]
+
+def _draw_preview():
+    """
+    Draw the preview of the reduction chosen in the panel at the active
+    vertex, from the cached dry run.
+    """
+    context = bpy.context
+    obj = context.active_object
+    topo_props = context.scene.topo_props
+    if (not topo_props.preview_bool or obj is None or obj.type != 'MESH'
+            or obj.mode != "EDIT" or not has_pattern(panel_type(topo_props))):
+        return
+    bm = bmesh.from_edit_mesh(obj.data)
+    start_vert = active_vert(bm)
+    if (start_vert is None):
+        return
+    result = dry_run(obj, bm, panel_type(topo_props), start_vert, panel_directions(topo_props),
+                     flip=topo_props.flip_bool, dissolve=topo_props.dissolve_bool)
+    if (result is None):
+        return
+    shader = gpu.shader.from_builtin('UNIFORM_COLOR' if bpy.app.version >= (4, 0, 0)
+                                     else '3D_UNIFORM_COLOR')
+    batch = batch_for_shader(shader, 'LINES', {"pos" : preview_lines(result, obj.matrix_world)})
+    gpu.state.line_width_set(2.0)
+    shader.uniform_float("color", _PREVIEW_COLOR)
+    batch.draw(shader)
+    gpu.state.line_width_set(1.0)
+
+def redraw_panels(context):
+    """
+    Redraw every 3D view, so the panel shows the current progress.
+    """
+    for area in context.screen.areas:
+        if (area.type == 'VIEW_3D'):
+            area.tag_redraw()
+
+def operation_projector(obj, topo_props):
+    """
+    Return the surface projector of an edit-mode object when the panel
+    asks for projection, or None.
+    """
+    if (not topo_props.project_bool or obj.mode != "EDIT"):
+        return None
+    return surface_projector(obj, bmesh.from_edit_mesh(obj.data))
+
+def panel_type(topo_props):
+    """
+    Return the name of the pattern chosen in the panel, such as "3to1" or,
+    for N to M, "6to2".
+    """
+    if (topo_props.type_enum == "NTOM"):
+        return "%dto%d" % (topo_props.from_int, topo_props.to_int)
+    return topo_props.type_enum
+
+def panel_directions(topo_props):
+    """
+    Return the (across, down) axes chosen in the panel, or None when the
+    grid is walked through face loops.
+    """
+    if (topo_props.orientation_enum == "TOPOLOGY"):
+        return None
+    return (int(topo_props.across_enum), int(topo_props.down_enum))
+
+def draw_stats(layout, stats):
+    """
+    Take in a layout and the Stats of the last operation and list its
+    phase timings and counters.
+    """
+    if (stats is None):
+        layout.label(text="No operation recorded yet")
+        return
+    layout.label(text="%s: %.2f ms" % (stats.operation, stats.total() * 1000))
+    for name, seconds in stats.timings.items():
+        layout.label(text="%s: %.2f ms" % (name, seconds * 1000))
+    for name, amount in stats.counters.items():
+        layout.label(text="%s: %d" % (name.replace("_", " "), amount))
+
+def draw_audit(layout, report):
+    """
+    Take in a layout and an audit report and list its counts.
+    """
+    layout.label(text="%d faces, %d verts, %d edges" % (report["faces"], report["verts"],
+                                                        report["edges"]))
+    for key in ("triangles", "ngons", "poles", "boundary_edges", "flipped_edges",
+                "non_manifold_edges", "loose_verts"):
+        layout.label(text="%s: %d" % (key.replace("_", " "), report[key]))
+    layout.label(text="fingerprint: %s" % report["fingerprint"][:16])
+
+class TopologyPanel(bpy.types.Panel):
+    """Creates a Panel"""
+    bl_label = "Topology Add-on"
+    bl_idname = "OBJECT_PT_topology"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "Topology"
+    
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+        topo_props = scene.topo_props
+
+        obj = context.object
+        col = layout.column()
+        
+        col.prop(topo_props, "type_enum")
+        if (topo_props.type_enum == "NTOM"):
+            row = col.row(align=True)
+            row.prop(topo_props, "from_int")
+            row.prop(topo_props, "to_int")
+            if (not has_pattern(panel_type(topo_props))):
+                col.label(text="No reduction from %d to %d faces" % (topo_props.from_int,
+                                                                     topo_props.to_int),
+                          icon="ERROR")
+        col.prop(topo_props, "orientation_enum")
+        if (topo_props.orientation_enum == "TOPOLOGY"):
+            col.prop(topo_props, "flip_bool")
+        else:
+            col.prop(topo_props, "across_enum")
+            col.prop(topo_props, "down_enum")
+        col.prop(topo_props, "dissolve_bool")
+        col.prop(topo_props, "project_bool")
+        if (_PREVIEW_SUPPORTED):
+            col.prop(topo_props, "preview_bool")
+        col.prop(topo_props, "mirror_enum")
+        col.prop(topo_props, "record_bool")
+        col.prop(topo_props, "batch_bool")
+        row = col.row(align=True)
+        row.operator(TopologyOperator.bl_idname, text="Retopologize!", icon="MESH_GRID")
+        row.operator(RevertOperator.bl_idname, text="", icon="LOOP_BACK")
+        if (topo_props.batch_bool):
+            col.operator(ChunkedBatchOperator.bl_idname).source = "SELECTED"
+        if (_batch_progress["running"]):
+            col.label(text="Applying %d / %d, Esc to cancel" % (_batch_progress["done"],
+                                                               _batch_progress["total"]))
+        
+        box = col.box()
+        box.prop(topo_props, "density_float")
+        row = box.row()
+        row.operator(FindSitesOperator.bl_idname, icon="VIEWZOOM")
+        row.operator(ApplySitesOperator.bl_idname)
+        box.operator(ChunkedBatchOperator.bl_idname, text="Apply at Sites in Chunks").source = "SITES"
+        box.label(text="%d sites found" % topo_props.site_count)
+        
+        box = col.box()
+        row = box.row()
+        row.operator(ReplayJournalOperator.bl_idname, icon="FILE_REFRESH")
+        row.operator(ClearJournalOperator.bl_idname, text="", icon="X")
+        if (obj is not None):
+            box.label(text="%d operations recorded" % len(read_journal(obj)))
+        
+        box = col.box()
+        box.operator(AuditOperator.bl_idname, icon="CHECKMARK")
+        if (_last_audit["report"] is not None):
+            draw_audit(box, _last_audit["report"])
+        
+        col.prop(topo_props, "stats_bool")
+        if (topo_props.stats_bool):
+            col.prop(topo_props, "log_path")
+            draw_stats(col.box(), instrumentation.last)
+    
+_classes = [TopologyProperties, TopologyOperator, RevertOperator, FindSitesOperator,
+            ApplySitesOperator, AuditOperator, ReplayJournalOperator, ClearJournalOperator,
+            ChunkedBatchOperator, TopologyPanel]        
+      
+def register():
+    for cls in _classes:
+        register_class(cls)
+        
+    bpy.types.Scene.topo_props = bpy.props.PointerProperty(type=TopologyProperties)
+    bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
+    if (_PREVIEW_SUPPORTED):
+        _preview_handle["handle"] = bpy.types.SpaceView3D.draw_handler_add(
+            _draw_preview, (), 'WINDOW', 'POST_VIEW')
+
+def unregister():
+    if (_on_depsgraph_update in bpy.app.handlers.depsgraph_update_post):
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
+    if (_preview_handle["handle"] is not None):
+        bpy.types.SpaceView3D.draw_handler_remove(_preview_handle["handle"], 'WINDOW')
+        _preview_handle["handle"] = None
+    _patch_cache.clear()
+    _preview_cache.clear()
+    _geometry_generation.clear()
+    _site_meshes.clear()
+    _surface_cache.clear()
+    _mirror_cache.clear()
+    _own_updates.clear()
+    _id_cache.clear()
+    _delta_journal.clear()
+    instrumentation.enabled = False
+    instrumentation.last = None
+    _last_audit["report"] = None
+    for cls in _classes:
+        unregister_class(cls)
+    del bpy.types.Scene.topo_props
@@ -0,0 +1,115 @@
+"""
+Tests for the Blender add-on. They need the bpy module, either inside
+Blender or from the bpy package, and are skipped without it:
+
+    blender -b --python-expr "import pytest; pytest.main(['tests'])"
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+bpy = pytest.importorskip("bpy")
+import bmesh
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import edge_loop_reducer
+from edge_loop_reducer import edge_loop_core as core
+from edge_loop_reducer import edge_loop_reduce as addon
+from test_core import SHAPE_DIRECTIONS, mesh_digest, shape_mesh
+
+@pytest.fixture(scope="module", autouse=True)
+def registered():
+    edge_loop_reducer.register()
+    yield
+    edge_loop_reducer.unregister()
+
+def mesh_object(mesh):
+    """
+    Link a new object holding the geometry of a PolyMesh to the scene,
+    make it the only selected and the active object and return it in
+    Object Mode with none of its elements selected.
+    """
+    co, faces = mesh.to_pydata()
+    me = bpy.data.meshes.new("mesh")
+    me.from_pydata([tuple(p) for p in co], [], faces)
+    me.update()
+    for name in (".select_vert", ".select_edge", ".select_poly"):
+        if (name in me.attributes):
+            me.attributes.remove(me.attributes[name])
+    obj = bpy.data.objects.new("mesh", me)
+    bpy.context.scene.collection.objects.link(obj)
+    for other in bpy.context.scene.objects:
+        other.select_set(False)
+    obj.select_set(True)
+    bpy.context.view_layer.objects.active = obj
+    return obj
+
+def set_panel(type, directions, batch=False, dissolve=False):
+    """
+    Set the panel properties of the scene for an operation along axes.
+    """
+    topo_props = bpy.context.scene.topo_props
+    topo_props.type_enum = type
+    topo_props.orientation_enum = "AXIS"
+    topo_props.across_enum, topo_props.down_enum = map(str, directions)
+    topo_props.batch_bool = batch
+    topo_props.dissolve_bool = dissolve
+
+@pytest.mark.parametrize("extra_layers", [False, True])
+def test_object_mode_operator(extra_layers):
+    mesh, anchor = shape_mesh("grid")
+    obj = mesh_object(mesh)
+    if (extra_layers):
+        obj.data.uv_layers.new()
+    assert addon.has_extra_layers(obj) == extra_layers
+    set_panel("3to1", SHAPE_DIRECTIONS["grid"])
+
+    # Nothing selected: the operator is not offered
+    assert not bpy.ops.object.topology_operator.poll()
+    obj.data.vertices[anchor].select = True
+    assert bpy.ops.object.topology_operator.poll()
+    assert bpy.ops.object.topology_operator() == {'FINISHED'}
+    assert obj.mode == "OBJECT"
+
+    assert core.reduce(mesh, anchor, "3to1", SHAPE_DIRECTIONS["grid"], False)
+    assert mesh_digest(addon.read_mesh_arrays(obj.data)) == mesh_digest(mesh)
+    assert len(obj.data.uv_layers) == extra_layers
+
+def test_edit_mode_revert():
+    mesh, anchor = shape_mesh("grid")
+    before = mesh_digest(mesh)
+    obj = mesh_object(mesh)
+    set_panel("3to1", SHAPE_DIRECTIONS["grid"])
+    bpy.ops.object.mode_set(mode='EDIT')
+    bm = bmesh.from_edit_mesh(obj.data)
+    bm.verts.ensure_lookup_table()
+    bm.verts[anchor].select = True
+    bm.select_history.add(bm.verts[anchor])
+    assert bpy.ops.object.topology_operator() == {'FINISHED'}
+
+    # Recording the operation only indexed the IDs around its patch
+    bm = bmesh.from_edit_mesh(obj.data)
+    ids = addon.element_ids(obj, bm)
+    assert not ids.complete
+    assert 0 < len(ids.by_id) < len(bm.verts) // 4
+    assert bpy.ops.object.topology_revert() == {'FINISHED'}
+    bpy.ops.object.mode_set(mode='OBJECT')
+    assert mesh_digest(addon.read_mesh_arrays(obj.data)) == before
+
+def test_find_and_apply_sites():
+    mesh, anchor = shape_mesh("grid")
+    obj = mesh_object(mesh)
+    set_panel("3to1", SHAPE_DIRECTIONS["grid"])
+    bpy.ops.object.mode_set(mode='EDIT')
+    assert bpy.ops.object.topology_find_sites() == {'FINISHED'}
+    assert bpy.context.scene.topo_props.site_count > 0
+    assert bpy.ops.object.topology_apply_sites() == {'FINISHED'}
+    bpy.ops.object.mode_set(mode='OBJECT')
+    report = core.audit(addon.read_mesh_arrays(obj.data))
+    assert report["faces"] < mesh.num_faces
+    assert report["flipped_edges"] == report["non_manifold_edges"] == 0
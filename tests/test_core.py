@@ -0,0 +1,502 @@
+"""
+Tests for the headless mesh core and the batch runner.
+
+Run from the repository root with:
+
+    python -m pytest tests
+
+The expected digests were recorded from the hand-written reductions the
+core shipped with before the patterns became data. Vertex and face
+order may change between versions, so results are compared through a
+digest of the geometry that does not depend on either.
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+import edge_loop_batch
+from edge_loop_reducer import edge_loop_core as core
+from bench_reductions import GENERATORS, SHAPES, SHAPE_DIRECTIONS
+
+# Geometry of reduce on a 600 face mesh of each shape, as
+# (without dissolve, with dissolve) per type
+REDUCE_DIGESTS = {
+        "grid" : {
+            "1to2" : ("8eb2f321512b8c18", "1f02118e043432a6"),
+            "1to3" : ("3326261d552e396c", "9ee22094d7cfbe36"),
+            "1to4" : ("85185cf2444e9f77", "a1a0802782f4ba6b"),
+            "3to1" : ("9501ea58f75f7d32", "b412b01f1f9ee30b"),
+            "4to1" : ("544443f74f2000d9", "771168c3f58fd67c"),
+            "2to1" : ("f4847ecc687e8267", "0f4d436472f779e1"),
+            "4to2" : ("9b75da6fbe52ab9c", "9b75da6fbe52ab9c"),
+            "5to3" : ("75bf381147656a3f", "6955627a9d856f4f")},
+        "cylinder" : {
+            "1to2" : ("b992731be2d85aa5", "e8c9005fc4dcf86c"),
+            "1to3" : ("fdc27b7b430b5bde", "f44bfafd56c24ea0"),
+            "1to4" : ("7fd0323d88e6db8b", "b2a14d26180e0895"),
+            "3to1" : ("d22ee5bb82d02e88", "6f3f43e37769c4d2"),
+            "4to1" : ("a3825c9a77fb4a0e", "9ec4f203e4b3a7dd"),
+            "2to1" : ("210619f84f25d148", "5c2823ef3fbf20aa"),
+            "4to2" : ("86d4f58c58d61732", "86d4f58c58d61732"),
+            "5to3" : ("86a7402ff612e5d3", "1ed646e247ed8edb")},
+        "sphere" : {
+            "1to2" : ("420475d893214a4b", "9b6403bc63bf64ad"),
+            "1to3" : ("63304867b598518c", "ef2af74ff70e2ac4"),
+            "1to4" : ("656fab5c0de0d9a9", "eb6cc51007fede75"),
+            "3to1" : ("35a36054bf410abc", "decd750d3ccfdc74"),
+            "4to1" : ("7a2eee8df85f3b49", "9947d8738399ef85"),
+            "2to1" : ("a14e09af6f0e8bbf", "6cef111eef15f59f"),
+            "4to2" : ("f2e9b474f2526eb3", "f2e9b474f2526eb3"),
+            "5to3" : ("a680459c2df737b5", "cd4c879addb9a6e9")}
+        }
+
+# Geometry of each pattern applied to the jittered grid of grid_co
+PATTERN_DIGESTS = {
+        "1to2" : ("8070281c1947c915", "8070281c1947c915"),
+        "1to3" : ("f292620faafc7db1", "f292620faafc7db1"),
+        "1to4" : ("eaf2226a4e386dee", "eaf2226a4e386dee"),
+        "3to1" : ("3537f3204854c803", "eb5686c9e0027a09"),
+        "4to1" : ("1a75ee047b5fa609", "37dd29f0091caa08"),
+        "2to1" : ("7c5f7a6385cb226e", "c879954e43bcd5fa"),
+        "4to2" : ("550511a809a11c4b", "550511a809a11c4b"),
+        "5to3" : ("3dc6074dd5de00cd", "6133c21126772fb8")
+        }
+
+def geometry_digest(co, face_size, loop_vert):
+    """
+    Take in vertex coordinates and CSR face arrays and return a digest of
+    the faces as rounded corner positions. Each face starts at its
+    smallest corner, so neither vertex nor face order changes the digest.
+    """
+    co = [tuple(p) for p in np.round(np.asarray(co), 4).tolist()]
+    loop_vert = np.asarray(loop_vert).tolist()
+    canon = []
+    start = 0
+    for size in np.asarray(face_size).tolist():
+        points = [co[i] for i in loop_vert[start:start + size]]
+        start += size
+        first = points.index(min(points))
+        canon.append(tuple(points[first:] + points[:first]))
+    return hashlib.blake2b(repr((sorted(canon), sorted(co))).encode(),
+                           digest_size=8).hexdigest()
+
+def mesh_digest(mesh):
+    """
+    Return the geometry digest of the live part of a PolyMesh.
+    """
+    mesh = mesh.compacted()
+    return geometry_digest(mesh.co[:mesh.num_verts], mesh.face_size[:mesh.num_faces],
+                           mesh.loop_vert[:mesh.num_loops])
+
+def grid_co(num_rows, num_columns):
+    """
+    Return the row-major coordinates of a grid of vertices in the XY
+    plane, jittered so no two points of a pattern coincide by accident.
+    """
+    row, column = np.meshgrid(np.arange(num_rows), np.arange(num_columns), indexing="ij")
+    co = np.stack([column, -row, np.zeros_like(row)], axis=-1).reshape(-1, 3).astype(float)
+    return co + np.random.default_rng(7).uniform(-.2, .2, co.shape)
+
+def shape_mesh(shape, num_faces=600):
+    """
+    Return a benchmark mesh and its anchor vertex.
+    """
+    co, face_start, face_size, loop_vert, anchor = GENERATORS[shape](num_faces)
+    return core.PolyMesh(co, face_start, face_size, loop_vert), anchor
+
+@pytest.mark.parametrize("dissolve", [False, True])
+@pytest.mark.parametrize("type", list(REDUCE_DIGESTS["grid"]))
+@pytest.mark.parametrize("shape", SHAPES)
+def test_reduce(shape, type, dissolve):
+    mesh, anchor = shape_mesh(shape)
+    assert core.reduce(mesh, anchor, type, SHAPE_DIRECTIONS[shape], dissolve)
+    assert mesh_digest(mesh) == REDUCE_DIGESTS[shape][type][dissolve]
+    report = core.audit(mesh)
+    assert report["flipped_edges"] == 0
+    assert report["non_manifold_edges"] == 0
+
+def test_reduce_without_grid():
+    mesh = core.grid_mesh(grid_co(2, 2), 2, 2)
+    before = mesh_digest(mesh)
+    assert not core.reduce(mesh, 0, "3to1", (1, -2), False)
+    assert mesh_digest(mesh) == before
+
+@pytest.mark.parametrize("type", list(REDUCE_DIGESTS["grid"]))
+@pytest.mark.parametrize("shape", SHAPES)
+def test_walk_grids_matches_resolve_grid(shape, type):
+    mesh, _ = shape_mesh(shape)
+    num_rows, num_columns = core.type_definitions[type]
+    directions = SHAPE_DIRECTIONS[shape]
+    grids, valid = core.walk_grids(mesh, np.arange(mesh.num_verts), num_rows, num_columns,
+                                   directions)
+    for vert in range(mesh.num_verts):
+        rows = core.resolve_grid(mesh, vert, num_rows, num_columns, directions)
+        assert valid[vert] == (rows is not None)
+        if (rows is not None):
+            assert (grids[vert] == rows).all()
+
+@pytest.mark.parametrize("type", list(REDUCE_DIGESTS["grid"]))
+@pytest.mark.parametrize("shape", ["grid", "cylinder"])
+def test_walk_grids_topology(shape, type):
+    # Where the axes follow the face loops, walking the loops towards the
+    # second vertex of the first row finds the same grid on one side
+    mesh, _ = shape_mesh(shape)
+    num_rows, num_columns = core.type_definitions[type]
+    axis_grids, valid = core.walk_grids(mesh, np.arange(mesh.num_verts), num_rows,
+                                        num_columns, SHAPE_DIRECTIONS[shape])
+    starts = np.flatnonzero(valid)
+    across = axis_grids[starts, 0, 1]
+    found = np.zeros(len(starts), dtype=bool)
+    for flip in (False, True):
+        grids, walked = core.walk_grids_topology(mesh, starts, across, num_rows, num_columns,
+                                                 flip)
+        assert (grids[~walked] == -1).all()
+        found |= walked & (grids == axis_grids[starts]).all(axis=(1, 2))
+        for i in range(0, len(starts), 37):
+            rows = core.resolve_grid_topology(mesh, starts[i], across[i], num_rows,
+                                              num_columns, flip)
+            assert (rows is None) == (not walked[i])
+            if (rows is not None):
+                assert (rows == grids[i]).all()
+    assert found.all()
+
+@pytest.mark.parametrize("dissolve", [False, True])
+@pytest.mark.parametrize("type", list(REDUCE_DIGESTS["grid"]))
+def test_reduce_topology(type, dissolve):
+    mesh, anchor = shape_mesh("grid")
+    across = core.resolve_grid(mesh, anchor, 1, 1, SHAPE_DIRECTIONS["grid"])[0, 1]
+    assert core.reduce(mesh, anchor, type, None, dissolve, across_vert=across)
+    assert mesh_digest(mesh) == REDUCE_DIGESTS["grid"][type][dissolve]
+
+@pytest.mark.parametrize("type", list(REDUCE_DIGESTS["grid"]))
+def test_find_sites(type):
+    # On a flat grid a site is any placement of the pattern's grid in one
+    # of the eight orientations of the square
+    mesh, _ = shape_mesh("grid")
+    num_rows, num_columns = core.type_definitions[type]
+    width = height = 25
+    expected = 4*(max(width - num_columns + 1, 0)*max(height - num_rows + 1, 0)
+                  + max(width - num_rows + 1, 0)*max(height - num_columns + 1, 0))
+    sites = core.find_sites(mesh, type)
+    assert len(set(zip(*(array.tolist() for array in sites)))) == len(sites[0]) == expected
+    grids = core.site_grids(mesh, type, sites)
+    assert (grids >= 0).all()
+    assert core.find_sites(mesh, type) is sites
+    # Faces neither grow nor shrink across a flat grid
+    assert len(core.find_sites(mesh, type, 1.01)[0]) == 0
+    assert len(core.find_sites(mesh, type, 0.99)[0]) == expected
+
+def clean_alone(shape, type, rows, dissolve):
+    """
+    Return whether applying a pattern at a single grid of a benchmark mesh
+    leaves no flipped or non-manifold edges.
+    """
+    mesh, _ = shape_mesh(shape)
+    core.apply_pattern(mesh, core.patterns[type], rows.ravel(), dissolve)
+    report = core.audit(mesh)
+    return (report["flipped_edges"] == report["non_manifold_edges"] == 0)
+
+@pytest.mark.parametrize("dissolve", [False, True])
+@pytest.mark.parametrize("type", list(REDUCE_DIGESTS["grid"]))
+@pytest.mark.parametrize("shape", SHAPES)
+def test_apply_wave(shape, type, dissolve):
+    # A wave gives what its grids give applied one after the other
+    mesh, _ = shape_mesh(shape)
+    num_rows, num_columns = core.type_definitions[type]
+    grids, valid = core.walk_grids(mesh, np.arange(0, mesh.num_verts, 3), num_rows,
+                                   num_columns, SHAPE_DIRECTIONS[shape])
+    # Near the poles of the sphere an axis walk can find grids wound against
+    # their faces, which no wave can apply cleanly
+    grids = np.array([rows for rows in grids[valid] if clean_alone(shape, type, rows, dissolve)])
+    kept = core.select_disjoint([core.patch_footprint(mesh, rows) for rows in grids])
+    assert core.select_disjoint_csr(*core.grid_footprints(mesh, grids), mesh.num_faces) == kept
+    one_by_one, _ = shape_mesh(shape)
+    for rows in grids[kept]:
+        core.apply_pattern(one_by_one, core.patterns[type], rows.ravel(), dissolve)
+    core.apply_wave(mesh, core.patterns[type], grids[kept], dissolve)
+    assert mesh_digest(mesh) == mesh_digest(one_by_one)
+    report = core.audit(mesh)
+    assert report["flipped_edges"] == report["non_manifold_edges"] == 0
+
+def test_reduce_many():
+    mesh, _ = shape_mesh("grid")
+    anchors = np.arange(mesh.num_verts)
+    grids, valid = core.walk_grids(mesh, anchors, 3, 3, SHAPE_DIRECTIONS["grid"])
+    expected, _ = shape_mesh("grid")
+    kept = core.select_disjoint([core.patch_footprint(expected, rows)
+                                 for rows in grids[valid]])
+    core.apply_wave(expected, core.patterns["3to1"], grids[valid][kept], False)
+    core.instrumentation.enabled = True
+    try:
+        applied = core.reduce_many(mesh, anchors, "3to1", SHAPE_DIRECTIONS["grid"], False)
+        stats = core.instrumentation.last
+    finally:
+        core.instrumentation.enabled = False
+    assert applied == len(kept) > 0
+    assert stats.counters["patches"] == applied
+    assert stats.counters["skipped"] == len(anchors) - applied
+    assert mesh_digest(mesh) == mesh_digest(expected)
+
+def test_reduce_sites():
+    mesh, _ = shape_mesh("grid")
+    sites = core.find_sites(mesh, "4to2")
+    applied = core.reduce_sites(mesh, "4to2", sites, True)
+    assert applied > 0
+    report = core.audit(mesh)
+    assert report["flipped_edges"] == report["non_manifold_edges"] == 0
+    # Sites share no faces, so each changes the face count like a single one
+    single, anchor = shape_mesh("grid")
+    assert core.reduce(single, anchor, "4to2", SHAPE_DIRECTIONS["grid"], True)
+    assert report["faces"] == 625 + applied*(core.audit(single)["faces"] - 625)
+
+@pytest.mark.parametrize("dissolve", [False, True])
+@pytest.mark.parametrize("name", list(PATTERN_DIGESTS))
+def test_compile_pattern(name, dissolve):
+    pattern = core.compile_pattern(name, core.pattern_definitions[name])
+    co = grid_co(pattern.num_rows, pattern.num_columns)
+    assert geometry_digest(*core.preview_pattern(pattern, co, dissolve)) == \
+        PATTERN_DIGESTS[name][dissolve]
+
+@pytest.mark.parametrize("name", list(PATTERN_DIGESTS))
+def test_compile_pattern_templates(name):
+    definition = core.pattern_definitions[name]
+    pattern = core.patterns[name]
+    num_cells = pattern.num_rows*pattern.num_columns
+    assert [pattern.num_rows - 1, pattern.num_columns - 1] == list(definition["grid"])
+    # Every point is an affine combination of the grid vertices
+    assert np.allclose(pattern.weights.sum(axis=1), 1)
+    new_verts = definition.get("new_verts", [])
+    expected = [[num_cells + new_verts.index(r) if isinstance(r, str)
+                 else r[0]*pattern.num_columns + r[1] for r in face]
+                for face in definition.get("faces", [])]
+    assert pattern.faces() == expected
+
+def test_compile_pattern_errors():
+    with pytest.raises(ValueError):
+        core.compile_pattern("bad", {"grid" : (1, 1), "dissolve" : [(2, 0)]})
+    with pytest.raises(ValueError):
+        core.compile_pattern("bad", {"grid" : (1, 1), "steps" : [("bevel", [])]})
+
+def cheapest_tiling(num_from, num_to):
+    """
+    Return the cost of the cheapest tiling of a num_from to num_to
+    reduction by trying every sequence of blocks, or None if there is none.
+    """
+    if (num_from == 0 or num_to == 0):
+        return 0.0 if num_from == num_to else None
+    costs = []
+    for name, block_from, block_to, cost in core._plan_options:
+        if (block_from <= num_from and block_to <= num_to):
+            rest = cheapest_tiling(num_from - block_from, num_to - block_to)
+            if (rest is not None):
+                costs.append(rest + cost)
+    return min(costs, default=None)
+
+RATIOS = [(n, m) for n in range(2, 11) for m in range(1, n)]
+
+@pytest.mark.parametrize("num_from, num_to", RATIOS)
+def test_plan_reduction(num_from, num_to):
+    plan = core._plan_reduction(num_from, num_to)
+    cost = cheapest_tiling(num_from, num_to)
+    if (cost is None):
+        assert plan is None
+        return
+    assert plan[0] == pytest.approx(cost)
+    blocks = [(1, 1) if name is None else core._ratio(name) for name in plan[1]]
+    assert sum(f for f, t in blocks) == num_from
+    assert sum(t for f, t in blocks) == num_to
+
+@pytest.mark.parametrize("num_from, num_to",
+                         [r for r in RATIOS if core._plan_reduction(*r) is not None])
+def test_synthesized_pattern(num_from, num_to):
+    # A synthesized pattern gives what its blocks give applied side by side
+    name = "%dto%d" % (num_from, num_to)
+    assert core.has_pattern(name)
+    co = grid_co(4, num_from + 1)
+    mesh = core.grid_mesh(co, 4, num_from + 1)
+    cells = np.arange(4*(num_from + 1)).reshape(4, -1)
+    column = 0
+    for block in core._plan_reduction(num_from, num_to)[1]:
+        if (block is None):
+            column += 1
+            continue
+        width = core.patterns[block].num_columns
+        core.apply_pattern(mesh, core.patterns[block],
+                           cells[:, column:column + width].ravel(), True)
+        column += width - 1
+    assert geometry_digest(*core.preview_pattern(core.patterns[name], co, True)) == \
+        mesh_digest(mesh)
+    report = core.audit(mesh)
+    assert report["flipped_edges"] == report["non_manifold_edges"] == 0
+
+@pytest.mark.parametrize("name", ["9to2", "5to1", "7to1", "2to6", "3to3", "0to0", "abc"])
+def test_unsupported_ratio(name, tmp_path):
+    assert not core.has_pattern(name)
+    with pytest.raises(KeyError):
+        core.patterns[name]
+    with pytest.raises(KeyError):
+        core.type_definitions[name]
+    mesh, anchor = shape_mesh("grid")
+    source = str(tmp_path / "grid.obj")
+    edge_loop_batch.write_obj(source, mesh)
+    result = edge_loop_batch.run_job({"input" : source, "operations" : [
+        {"anchor" : anchor, "type" : name, "directions" : [1, -2]}]})
+    assert not result["ok"]
+    assert name in result["error"]
+
+def quad_grid():
+    """
+    Return a clean 4x4 quad grid as a PolyMesh.
+    """
+    return core.grid_mesh(grid_co(5, 5), 5, 5)
+
+def test_audit_clean():
+    report = core.audit(quad_grid())
+    assert report["faces"] == 16
+    assert report["verts"] == 25
+    assert report["edges"] == 40
+    assert report["boundary_edges"] == 16
+    assert report["triangles"] == report["ngons"] == 0
+    assert report["flipped_edges"] == report["non_manifold_edges"] == 0
+    assert report["loose_verts"] == 0
+    assert report["poles"] == 0
+
+def test_audit_fingerprint_ignores_order():
+    mesh = quad_grid()
+    co, faces = mesh.to_pydata()
+    order = np.random.default_rng(1).permutation(len(co))
+    remap = np.argsort(order)
+    shuffled = core.PolyMesh.from_pydata(np.asarray(co)[order],
+                                         [[int(remap[v]) for v in f] for f in faces[::-1]])
+    assert core.audit(shuffled)["fingerprint"] == core.audit(mesh)["fingerprint"]
+
+def test_audit_flipped_face():
+    mesh = quad_grid()
+    clean = core.audit(mesh)
+    mesh.reverse_face(5)
+    report = core.audit(mesh)
+    assert report["flipped_edges"] == 4
+    assert report["fingerprint"] != clean["fingerprint"]
+
+def test_audit_non_manifold_and_loose():
+    mesh = quad_grid()
+    extra = mesh.add_verts([(0.5, 0.5, 1.0), (9.0, 9.0, 9.0)])
+    # Edge 6-7 is shared by two quads already
+    mesh.add_faces([(6, 7, int(extra[0]))])
+    report = core.audit(mesh)
+    assert report["non_manifold_edges"] == 1
+    assert report["triangles"] == 1
+    assert report["loose_verts"] == 1
+
+def test_audit_region():
+    mesh = quad_grid()
+    mesh.merge_faces([5, 6])
+    report = core.audit(mesh, np.arange(mesh.num_faces)[mesh.face_alive[:mesh.num_faces]][-1:])
+    assert report["faces"] == 1
+    assert report["ngons"] == 1
+    assert report["boundary_edges"] == 0
+    assert report["loose_verts"] == 0
+
+def assert_same_mesh(loaded, mesh):
+    """
+    Check that a mesh read back from a file holds the live geometry of
+    the mesh that was written, in the same order.
+    """
+    compact = mesh.compacted()
+    assert loaded.num_verts == compact.num_verts
+    assert np.allclose(loaded.co[:loaded.num_verts], compact.co[:compact.num_verts])
+    assert loaded.to_pydata()[1] == compact.to_pydata()[1]
+
+def test_obj_round_trip(tmp_path):
+    mesh, anchor = shape_mesh("sphere")
+    assert core.reduce(mesh, anchor, "4to2", SHAPE_DIRECTIONS["sphere"], True)
+    path = str(tmp_path / "sphere.obj")
+    edge_loop_batch.write_obj(path, mesh)
+    loaded = edge_loop_batch.read_obj(path)
+    assert_same_mesh(loaded, mesh)
+    assert core.audit(loaded)["fingerprint"] == core.audit(mesh)["fingerprint"]
+
+def write_ply_by_hand(path, mesh, format):
+    """
+    Write a PLY file the way other tools do: double positions with a
+    normal, a comment, a face property after the index list with int16
+    counts, and an extra element between the vertices and the faces.
+    """
+    co, faces = mesh.to_pydata()
+    header = ["ply", "format %s 1.0" % format, "comment written by hand",
+              "element vertex %d" % len(co)]
+    header += ["property double %s" % axis for axis in ("x", "y", "z", "nx")]
+    header += ["element edge 1", "property int vertex1", "property int vertex2",
+               "element face %d" % len(faces), "property list short int vertex_indices",
+               "property uchar flags", "end_header"]
+    with open(path, "wb") as f:
+        f.write(("\n".join(header) + "\n").encode("ascii"))
+        if (format == "ascii"):
+            for x, y, z in co:
+                f.write(b"%r %r %r 0\n" % (x, y, z))
+            f.write(b"0 1\n")
+            for face in faces:
+                f.write(("%d %s 7\n" % (len(face), " ".join(map(str, face)))).encode("ascii"))
+            return
+        endian = ">" if format == "binary_big_endian" else "<"
+        for x, y, z in co:
+            f.write(np.array([x, y, z, 0], dtype=endian + "f8").tobytes())
+        f.write(np.array([0, 1], dtype=endian + "i4").tobytes())
+        for face in faces:
+            f.write(np.array([len(face)], dtype=endian + "i2").tobytes())
+            f.write(np.array(face, dtype=endian + "i4").tobytes())
+            f.write(np.array([7], dtype="u1").tobytes())
+
+def test_ply_round_trip(tmp_path):
+    # Triangles at the poles, quads and the n-gons of 1to2 without dissolve
+    mesh, anchor = shape_mesh("sphere")
+    assert core.reduce(mesh, anchor, "1to2", SHAPE_DIRECTIONS["sphere"], False)
+    path = str(tmp_path / "sphere.ply")
+    edge_loop_batch.write_ply(path, mesh)
+    loaded = edge_loop_batch.read_ply(path)
+    assert_same_mesh(loaded, mesh)
+    assert core.audit(loaded)["fingerprint"] == core.audit(mesh)["fingerprint"]
+
+@pytest.mark.parametrize("shape", ["grid", "sphere"])
+@pytest.mark.parametrize("format", ["ascii", "binary_little_endian", "binary_big_endian"])
+def test_read_ply(tmp_path, format, shape):
+    # The grid has only quads and is read in one piece, the sphere face by face
+    mesh, _ = shape_mesh(shape)
+    path = str(tmp_path / "mesh.ply")
+    write_ply_by_hand(path, mesh, format)
+    assert_same_mesh(edge_loop_batch.read_ply(path), mesh)
+
+def test_read_ply_errors(tmp_path):
+    path = str(tmp_path / "mesh.ply")
+    edge_loop_batch.write_obj(path, shape_mesh("grid")[0])
+    with pytest.raises(ValueError):
+        edge_loop_batch.read_ply(path)
+    with open(path, "wb") as f:
+        f.write(b"ply\nformat ascii 1.0\nelement vertex 0\n")
+    with pytest.raises(ValueError):
+        edge_loop_batch.read_ply(path)
+
+def test_run_job(tmp_path):
+    mesh, anchor = shape_mesh("grid")
+    source = str(tmp_path / "grid.obj")
+    output = str(tmp_path / "out" / "grid.obj")
+    os.makedirs(os.path.dirname(output))
+    edge_loop_batch.write_obj(source, mesh)
+    job = {"input" : source, "output" : output, "audit" : True,
+           "operations" : [{"anchor" : anchor, "type" : "3to1", "directions" : ["+X", "-Y"]}]}
+    result = edge_loop_batch.run_job(job)
+    assert result["ok"], result.get("error")
+    assert result["applied"] == [1]
+    assert result["audit"]["flipped_edges"] == 0
+    json.dumps(result)
+    assert core.reduce(mesh, anchor, "3to1", SHAPE_DIRECTIONS["grid"], False)
+    assert mesh_digest(edge_loop_batch.read_obj(output)) == mesh_digest(mesh)